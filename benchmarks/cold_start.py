@@ -0,0 +1,128 @@
+"""
+Measure the time from starting the server to the first accepted websocket,
+with and without a snapshot to restore
+
+Usage: python -m benchmarks.cold_start --players 1000 10000 --runs 3
+A snapshot with an ongoing round of the given number of players is written,
+then a server is started on it and a player connects as soon as possible
+Prints one JSON line per measurement
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+from benchmarks.websocket_load import (
+    free_port,
+    random_guesses,
+    read_server_metrics,
+)
+from src.domain.entities import GuessList
+from src.rooms import DEFAULT_ROOM, RoomManager
+from src.scheduler import Scheduler
+from src.snapshot import Snapshotter
+
+
+def write_snapshot(path: str, n_players: int, seed: int) -> str:
+    """
+    Returns the theme word of the ongoing round, to check that it is resumed
+    """
+    rng = random.Random(seed)
+    room_manager = RoomManager(scheduler=Scheduler())
+    runner = room_manager.get_or_create(DEFAULT_ROOM)
+    for i in range(n_players):
+        runner.game.set_guesses(
+            player_name=f"player{i}", guess_list=GuessList(random_guesses(rng))
+        )
+    runner.next_switch = dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1)
+    Snapshotter(path, room_manager, room_manager.scheduler).save()
+    return runner.game.get_game_state()[0].theme_word
+
+
+async def connect_first_player(ws_url: str, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(f"{ws_url}/ws?player_name=cold") as ws:
+                accepted_at = time.monotonic()
+                while True:
+                    message = json.loads(await ws.recv())
+                    if message["type"] == "game_state":
+                        return {"accepted_at": accepted_at, "game_state": message}
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.005)
+
+
+def measure(snapshot_path, timeout: float) -> dict:
+    port = free_port()
+    env = os.environ.copy()
+    env.pop("SNAPSHOT_PATH", None)
+    if snapshot_path is not None:
+        env["SNAPSHOT_PATH"] = snapshot_path
+    started_at = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    try:
+        first = asyncio.run(connect_first_player(f"ws://127.0.0.1:{port}", timeout))
+        server_metrics = read_server_metrics(f"http://127.0.0.1:{port}")
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "seconds_to_first_connection": first["accepted_at"] - started_at,
+        "theme_word": first["game_state"]["data"]["round"]["theme_word"],
+        "server_restore_seconds": server_metrics.get(
+            "consensus_snapshot_restore_duration_seconds"
+        ),
+        "server_seconds_to_first_connection": server_metrics.get(
+            "consensus_startup_to_first_connection_seconds"
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(args.runs):
+            print(
+                json.dumps(
+                    {"players": 0, "snapshot_bytes": 0} | measure(None, args.timeout)
+                )
+            )
+        for n_players in args.players:
+            path = os.path.join(directory, f"snapshot_{n_players}.bin")
+            theme_word = write_snapshot(path, n_players, args.seed)
+            for _ in range(args.runs):
+                report = measure(path, args.timeout)
+                report["resumed_round"] = report.pop("theme_word") == theme_word
+                print(
+                    json.dumps(
+                        {"players": n_players, "snapshot_bytes": os.path.getsize(path)}
+                        | report
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure the memory used by the stored guesses and results of a round
+
+Usage: python -m benchmarks.memory [--players 10000 100000]
+Each player's words are decoded from JSON, as received from the websocket,
+so that identical words of different players are distinct objects
+Prints one JSON line per player count
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from src.domain.constants import N_GUESSES
+from src.domain.entities import GuessList
+from src.domain.game import Game
+from src.state_store import StateStore
+
+VOCABULARY_SIZE = 2000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vocabulary = [f"word{i}" for i in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    for n_players in args.players:
+        rng = random.Random(args.seed)
+        frames = [
+            json.dumps(
+                {
+                    "words": list(
+                        set(rng.choices(vocabulary, weights=weights, k=N_GUESSES))
+                    )
+                }
+            )
+            for _ in range(n_players)
+        ]
+        player_names = [f"player{i}" for i in range(n_players)]
+
+        gc.collect()
+        tracemalloc.start()
+        game = Game(StateStore())
+        game.start_new_round()
+        for player_name, frame in zip(player_names, frames):
+            game.set_guesses(
+                player_name=player_name,
+                guess_list=GuessList(json.loads(frame)["words"]),
+            )
+        gc.collect()
+        guesses_bytes, _ = tracemalloc.get_traced_memory()
+        game.complete_current_round()
+        gc.collect()
+        total_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            json.dumps(
+                {
+                    "n_players": n_players,
+                    "guesses_bytes_per_player": guesses_bytes / n_players,
+                    "total_bytes_per_player": total_bytes / n_players,
+                    "total_megabytes": total_bytes / 1e6,
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
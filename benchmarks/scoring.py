@@ -0,0 +1,70 @@
+"""
+Compare the scoring engines on synthetic rounds of increasing size
+
+Usage: python -m benchmarks.scoring [--players 1000 10000 50000] [--repeat 3]
+Prints one JSON line per engine and player count
+"""
+
+import argparse
+import json
+import random
+import time
+
+from src.domain.constants import N_GUESSES
+from src.domain.entities import GuessList
+from src.domain.game import SCORING_ENGINES
+
+VOCABULARY_SIZE = 2000
+
+
+def make_guesses(n_players: int, seed: int = 0) -> dict[str, GuessList]:
+    """
+    Players pick their words with a skewed distribution, as real players tend
+    to agree on a few obvious words
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    guesses = {}
+    for player_index in range(n_players):
+        words = set(rng.choices(vocabulary, weights=weights, k=N_GUESSES))
+        guesses[f"player{player_index}"] = GuessList(list(words))
+    return guesses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--players", type=int, nargs="+", default=[1000, 10000, 50000, 100000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", default=list(SCORING_ENGINES))
+    args = parser.parse_args()
+
+    for n_players in args.players:
+        guesses = make_guesses(n_players)
+        reference = None
+        for engine_name in args.engines:
+            engine = SCORING_ENGINES[engine_name]
+            durations = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = engine(guesses, None)
+                durations.append(time.perf_counter() - start)
+            if reference is None:
+                reference = result
+            print(
+                json.dumps(
+                    {
+                        "engine": engine_name,
+                        "n_players": n_players,
+                        "best_seconds": min(durations),
+                        "mean_seconds": sum(durations) / len(durations),
+                        "matches_reference": result == reference,
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
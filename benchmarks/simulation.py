@@ -0,0 +1,84 @@
+"""
+Play many rounds offline on a virtual clock, to follow the memory used,
+the eviction of old rounds and the scoring throughput over a long run
+
+Usage: python -m benchmarks.simulation [--players 1000] [--rounds 10000]
+    [--max-rounds-stored 100] [--engine python] [--report-every 1000]
+Prints one JSON line per report
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from src.simulation import Simulation
+from src.state_store import StateStore
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+async def run(args):
+    simulation = Simulation(
+        n_players=args.players,
+        state_store=StateStore(max_rounds_stored=args.max_rounds_stored),
+        scoring_engine=args.engine,
+        seed=args.seed,
+    )
+    state = simulation.runner.game.state
+    start = time.perf_counter()
+    last_report = start
+    for played in range(1, args.rounds + 1):
+        await simulation.play_round()
+        if played % args.report_every == 0 or played == args.rounds:
+            now = time.perf_counter()
+            print(
+                json.dumps(
+                    {
+                        "rounds_played": played,
+                        "rounds_per_second": args.report_every / (now - last_report),
+                        "simulated_days": (
+                            simulation.clock.now() - simulation.clock.start
+                        ).total_seconds()
+                        / 86400,
+                        "rounds_stored": len(state.state.rounds),
+                        "rss_megabytes": rss_bytes() / 1e6,
+                    }
+                ),
+                flush=True,
+            )
+            last_report = now
+    elapsed = time.perf_counter() - start
+    print(
+        json.dumps(
+            {
+                "n_players": args.players,
+                "n_rounds": args.rounds,
+                "engine": args.engine,
+                "rounds_per_second": args.rounds / elapsed,
+                "guesses_per_second": args.rounds * args.players / elapsed,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10000)
+    parser.add_argument("--max-rounds-stored", type=int, default=100)
+    parser.add_argument("--engine", default="python")
+    parser.add_argument("--report-every", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
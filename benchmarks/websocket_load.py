@@ -0,0 +1,263 @@
+"""
+Simulate many websocket players through full rounds against a local server
+
+Usage: python -m benchmarks.websocket_load --players 1000 --rounds 3 [--spawn | --url ...]
+With --spawn, a uvicorn server is started on a free port and its memory is reported
+Prints a single JSON object, so that results can be compared between releases
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+from src.domain.constants import N_GUESSES
+from src.domain.entities import GuessList
+from src.domain.game import compute_round_result
+
+VOCABULARY = [f"word{i}" for i in range(300)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def percentiles(values: list[float]) -> dict:
+    if len(values) == 0:
+        return {}
+    values = sorted(values)
+    return {
+        f"p{p}": values[min(len(values) - 1, int(len(values) * p / 100))]
+        for p in (50, 90, 99)
+    } | {"max": values[-1]}
+
+
+def random_guesses(rng: random.Random) -> list[str]:
+    return list(set(rng.choices(VOCABULARY, weights=WEIGHTS, k=N_GUESSES)))
+
+
+class SimulatedPlayer:
+    def __init__(self, player_name: str):
+        self.player_name = player_name
+        self.websocket = None
+        self.n_received = 0
+        # Arrival time and completion flag of the last game_state message
+        self.last_game_state: tuple[float, bool] = (0.0, False)
+        self.guesses: list[str] = []
+
+    async def connect(self, url: str):
+        self.websocket = await websockets.connect(
+            f"{url}/ws?player_name={self.player_name}",
+            max_size=None,
+            open_timeout=60,
+        )
+        asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        try:
+            async for text in self.websocket:
+                self.n_received += 1
+                message = json.loads(text)
+                if message["type"] == "game_state":
+                    self.last_game_state = (
+                        time.perf_counter(),
+                        message["data"]["round"]["is_completed"],
+                    )
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send_guesses(self, guesses: list[str]):
+        self.guesses = guesses
+        await self.websocket.send(json.dumps({"words": guesses}))
+
+
+def read_server_metrics(http_url: str) -> dict[str, float]:
+    text = urllib.request.urlopen(f"{http_url}/metrics").read().decode()
+    return {
+        line.split(" ")[0]: float(line.split(" ")[1])
+        for line in text.splitlines()
+        if not line.startswith("#")
+    }
+
+
+def post_switch(http_url: str):
+    urllib.request.urlopen(
+        urllib.request.Request(f"{http_url}/switch", method="POST")
+    ).read()
+
+
+async def wait_for_game_states(
+    players: list[SimulatedPlayer], since: float, is_completed: bool, timeout: float
+) -> list[float]:
+    """
+    Latency of the first game_state with the expected completion after `since`
+    for each player (players that did not receive it in time are left out)
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if all(
+            player.last_game_state[0] >= since
+            and player.last_game_state[1] == is_completed
+            for player in players
+        ):
+            break
+        await asyncio.sleep(0.01)
+    return [
+        player.last_game_state[0] - since
+        for player in players
+        if player.last_game_state[0] >= since
+        and player.last_game_state[1] == is_completed
+    ]
+
+
+async def run(args, http_url: str) -> dict:
+    url = http_url.replace("http", "ws", 1)
+    rng = random.Random(args.seed)
+    players = [SimulatedPlayer(f"player{i}") for i in range(args.players)]
+    loop = asyncio.get_running_loop()
+
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect(player):
+        async with semaphore:
+            await player.connect(url)
+
+    await asyncio.gather(*(connect(player) for player in players))
+    connect_storm_seconds = time.perf_counter() - start
+
+    results_latencies = []
+    round_start_latencies = []
+    scoring_seconds = []
+    n_received_before = sum(player.n_received for player in players)
+    metrics_before = await loop.run_in_executor(None, read_server_metrics, http_url)
+    rounds_start = time.perf_counter()
+    for _ in range(args.rounds):
+        if any(player.last_game_state[1] for player in players):
+            since = time.perf_counter()
+            await loop.run_in_executor(None, post_switch, http_url)
+            round_start_latencies += await wait_for_game_states(
+                players, since, is_completed=False, timeout=args.timeout
+            )
+
+        await asyncio.gather(
+            *(player.send_guesses(random_guesses(rng)) for player in players)
+        )
+        # Let the server process the guesses before ending the round
+        await asyncio.sleep(args.guess_delay)
+
+        since = time.perf_counter()
+        await loop.run_in_executor(None, post_switch, http_url)
+        results_latencies += await wait_for_game_states(
+            players, since, is_completed=True, timeout=args.timeout
+        )
+
+        # Also score the same guesses here, to compare with the server time
+        guesses_by_player = {
+            player.player_name: GuessList(player.guesses) for player in players
+        }
+        scoring_start = time.perf_counter()
+        compute_round_result(guesses_by_player)
+        scoring_seconds.append(time.perf_counter() - scoring_start)
+    rounds_seconds = time.perf_counter() - rounds_start
+    n_received = sum(player.n_received for player in players) - n_received_before
+    metrics_after = await loop.run_in_executor(None, read_server_metrics, http_url)
+
+    def server_mean(histogram: str) -> float:
+        count = (
+            metrics_after[f"{histogram}_count"] - metrics_before[f"{histogram}_count"]
+        )
+        total = metrics_after[f"{histogram}_sum"] - metrics_before[f"{histogram}_sum"]
+        return total / count if count > 0 else None
+
+    await asyncio.gather(*(player.websocket.close() for player in players))
+    return {
+        "n_players": args.players,
+        "n_rounds": args.rounds,
+        "connect_storm_seconds": connect_storm_seconds,
+        "results_broadcast_latency_seconds": percentiles(results_latencies),
+        "round_start_broadcast_latency_seconds": percentiles(round_start_latencies),
+        "n_missed_broadcasts": args.players * args.rounds - len(results_latencies),
+        "messages_per_second": n_received / rounds_seconds,
+        "scoring_seconds": statistics.mean(scoring_seconds),
+        "server_scoring_seconds": server_mean(
+            "consensus_round_result_duration_seconds"
+        ),
+        "server_broadcast_seconds": server_mean("consensus_broadcast_duration_seconds"),
+        "server_game_loop_lag_seconds": server_mean("consensus_game_loop_lag_seconds"),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def wait_for_server(http_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f"{http_url}/").read()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--guess-delay", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    server = None
+    http_url = args.url
+    if args.spawn:
+        port = free_port()
+        http_url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=os.environ.copy(),
+        )
+    try:
+        wait_for_server(http_url)
+        report = asyncio.run(run(args, http_url))
+        report["server_rss_bytes"] = rss_bytes(server.pid) if server else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
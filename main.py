@@ -2,4 +2,5 @@ import uvicorn
 from src.app import app
 
 if __name__ == "__main__":
-    uvicorn.run("src.app:app", host="0.0.0.0", port=8000)
+    # Compressed frames for the clients that negotiate permessage-deflate
+    uvicorn.run("src.app:app", host="0.0.0.0", port=8000, ws_per_message_deflate=True)
@@ -1,37 +1,167 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import asyncio
-import datetime as dt
-from fastapi.middleware.cors import CORSMiddleware
+import json
+import os
+import time
 
-from src.connectivity import WebsocketConnectionPool
+from src import metrics
+from src.broker import UnixSocketBrokerHub
+from src.connectivity import (
+    InvalidClientMessage,
+    WebsocketConnectionPool,
+    receive_client_message,
+)
+from src.cors import add_cors_middleware
+from src.domain.aggregates import PERIODS
+from src.domain.canonical import DEFAULT_CANONICALIZER, Canonicalizer
 from src.domain.entities import GameError
+from src.fanout import GameHost, RemoteConnectionPool
 from src.game_runner import GameRunner
+from src.http_cache import ResponseCache, etag_matches
+from src.log import configure_logging, get_logger, stop_logging
+from src.messages import negotiate_protocol
+from src.rooms import DEFAULT_ROOM, RoomManager
+from src.round_archive import RoundArchive
+from src.scheduler import Scheduler
+from src.snapshot import Snapshotter
+from src.sqlite_state_store import SqliteStateStore
+from src.state_store import StateStore
+
+started_at = time.monotonic()
+configure_logging()
+logger = get_logger("app")
 
 app = FastAPI()
+add_cors_middleware(app)
+
+# Persist the state of the default room in SQLite if a database path is provided,
+# and archive its rounds evicted from memory if an archive path is provided
+# Other rooms are small private games kept in memory
+state_db_path = os.environ.get("STATE_DB_PATH")
+round_archive_path = os.environ.get("ROUND_ARCHIVE_PATH")
+max_rounds_stored = (
+    int(os.environ["MAX_ROUNDS_STORED"]) if "MAX_ROUNDS_STORED" in os.environ else None
+)
+round_archive = RoundArchive(round_archive_path) if round_archive_path else None
+default_room_state_store = (
+    SqliteStateStore(
+        state_db_path, max_rounds_stored=max_rounds_stored, archive=round_archive
+    )
+    if state_db_path
+    else StateStore(max_rounds_stored=max_rounds_stored, archive=round_archive)
+)
 
-origins = [
-    "http://localhost:3000",
-    "http://localhost:3001",
-    "https://consensus.anog.fr",
-    "https://www.consensus.anog.fr",
-    "https://consensus-front.vercel.app",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# With PROCESS_ROLE=game, this process only runs the game loop and the websockets
+# are served by worker processes (src.worker_app) connected on BROKER_SOCKET_PATH
+is_game_process = os.environ.get("PROCESS_ROLE") == "game"
+broker_hub = (
+    UnixSocketBrokerHub(os.environ.get("BROKER_SOCKET_PATH", "/tmp/consensus.sock"))
+    if is_game_process
+    else None
 )
 
-websocket_connection_pool = WebsocketConnectionPool()
-runner = GameRunner(connection_pool=websocket_connection_pool)
+# Guesses are scored by their canonical form (accents, plurals, elisions), with
+# optional aliases read from a JSON object mapping words to their alias
+word_aliases_path = os.environ.get("WORD_ALIASES_PATH")
+if word_aliases_path:
+    with open(word_aliases_path, encoding="utf-8") as f:
+        canonicalizer = Canonicalizer(alias_by_word=json.load(f))
+else:
+    canonicalizer = DEFAULT_CANONICALIZER
+
+scheduler = Scheduler()
+room_manager = RoomManager(
+    scheduler=scheduler,
+    scoring_engine=os.environ.get("SCORING_ENGINE", "python"),
+    progress_interval_seconds=(
+        float(os.environ["ROUND_PROGRESS_INTERVAL_SECONDS"])
+        if "ROUND_PROGRESS_INTERVAL_SECONDS" in os.environ
+        else None
+    ),
+    hide_progress_words=os.environ.get("ROUND_PROGRESS_HIDE_WORDS") == "1",
+    canonicalizer=canonicalizer,
+    state_store_factory=lambda room: (
+        default_room_state_store
+        if room == DEFAULT_ROOM
+        else StateStore(max_rounds_stored=max_rounds_stored)
+    ),
+    connection_pool_factory=lambda room: (
+        RemoteConnectionPool(room, broker_hub)
+        if is_game_process
+        else WebsocketConnectionPool()
+    ),
+)
+game_host = GameHost(broker_hub, room_manager) if is_game_process else None
+
+# Rooms are saved to SNAPSHOT_PATH periodically and on shutdown, and restored
+# on startup, so that a stopped machine resumes the ongoing rounds
+snapshot_path = os.environ.get("SNAPSHOT_PATH")
+snapshotter = (
+    Snapshotter(snapshot_path, room_manager, scheduler) if snapshot_path else None
+)
+has_accepted_connection = False
+
+# Responses built from the standings and cross-round aggregates, encoded once
+# per version
+aggregates_response_cache = ResponseCache()
+
+metrics.active_connections.set_function(
+    lambda: sum(
+        len(runner.websocket_connection_pool.active_connections)
+        for runner in room_manager.runner_by_room.values()
+    )
+)
+metrics.active_event_streams.set_function(
+    lambda: sum(
+        runner.n_event_streams for runner in room_manager.runner_by_room.values()
+    )
+)
+
+# Longest wait of a /state long-poll, and interval of the /events keepalives
+# so that proxies do not close idle streams
+max_long_poll_seconds = 30.0
+event_stream_keepalive_seconds = 15.0
 
 
 @app.on_event("startup")
 async def app_startup():
-    asyncio.create_task(runner.run_game_loop_forever())
+    if snapshotter is not None:
+        start = time.perf_counter()
+        n_rooms = snapshotter.restore()
+        metrics.snapshot_restore_duration_seconds.set(time.perf_counter() - start)
+        logger.info(
+            "Restored snapshot",
+            extra={
+                "event": "snapshot_restored",
+                "n_rooms": n_rooms,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+            },
+        )
+        snapshotter.start()
+    room_manager.get_or_create(DEFAULT_ROOM)
+    asyncio.create_task(scheduler.run_forever())
+    if game_host is not None:
+        await game_host.start()
+
+
+@app.on_event("shutdown")
+async def app_shutdown():
+    if snapshotter is not None:
+        snapshotter.save()
+    if isinstance(default_room_state_store, SqliteStateStore):
+        default_room_state_store.close()
+    if round_archive is not None:
+        round_archive.close()
+    if broker_hub is not None:
+        await broker_hub.close()
+    stop_logging()
+
+
+def get_runner(room: str) -> GameRunner:
+    if room not in room_manager.runner_by_room:
+        raise HTTPException(status_code=404, detail="Unknown room")
+    return room_manager.runner_by_room[room]
 
 
 @app.get("/")
@@ -39,50 +169,278 @@ def healthcheck():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/switch")
-def switch():
+async def switch(room: str = DEFAULT_ROOM):
     """
     Debug endpoint to end the current round or start a new round immediately
+    Async so that the scheduler is woken up from the event loop thread
+    """
+    get_runner(room).next_switch = scheduler.clock.now()
+
+
+@app.get("/standings")
+async def standings(
+    request: Request, room: str = DEFAULT_ROOM, offset: int = 0, limit: int = 100
+):
+    """
+    Full standings of the latest completed round, by pages
+    The game state message only includes the top of the leaderboard
+    """
+    runner = get_runner(room)
+    round_standings = runner.standings
+    if round_standings is None:
+        raise HTTPException(status_code=404, detail="No completed round yet")
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), 1000)
+
+    def build():
+        return {
+            "n_players": round_standings.n_players,
+            "offset": offset,
+            "standings": [
+                {"rank": rank, "player_name": player_name, "score": score}
+                for rank, player_name, score in round_standings.get_page(offset, limit)
+            ],
+        }
+
+    return aggregates_response_cache.respond(
+        request, ("standings", room, offset, limit), runner.standings_tag, build
+    )
+
+
+@app.get("/state")
+async def state(request: Request, room: str = DEFAULT_ROOM, wait: float = 0):
+    """
+    The game state message, for clients that cannot use a websocket
+    With a matching If-None-Match (or state_tag) and a wait in seconds, the
+    request is held until the game state changes, then answered with the new
+    state, or with a 304 at the end of the wait
+    The body is encoded once per state and shared with the websocket broadcasts
+    """
+    runner = get_runner(room)
+    state_tag = runner.state_tag
+    is_up_to_date = (
+        etag_matches(request, f'"{state_tag}"')
+        or request.query_params.get("state_tag") == state_tag
+    )
+    if is_up_to_date and wait > 0:
+        await runner.wait_for_state_change(
+            state_tag, timeout=min(wait, max_long_poll_seconds)
+        )
+        is_up_to_date = runner.state_tag == state_tag
+        state_tag = runner.state_tag
+    headers = {"ETag": f'"{state_tag}"', "Cache-Control": "no-cache"}
+    if is_up_to_date:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=runner.encoded_game_state_message.binary,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+@app.get("/events")
+async def events(room: str = DEFAULT_ROOM):
+    """
+    Read-only stream of the game state messages, as server-sent events
+    """
+    runner = get_runner(room)
+
+    async def stream():
+        runner.n_event_streams += 1
+        try:
+            while True:
+                state_tag = runner.state_tag
+                yield runner.encoded_game_state_message.event_stream
+                while runner.state_tag == state_tag:
+                    await runner.wait_for_state_change(
+                        state_tag, timeout=event_stream_keepalive_seconds
+                    )
+                    if runner.state_tag == state_tag:
+                        yield b": keepalive\n\n"
+        finally:
+            runner.n_event_streams -= 1
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/history")
+async def history(request: Request, room: str = DEFAULT_ROOM, limit: int = 20):
+    """
+    Summaries of the latest completed rounds, most recent first
+    """
+    aggregates = get_runner(room).game.aggregates
+    limit = min(max(limit, 0), aggregates.history_size)
+
+    def build():
+        return {
+            "rounds": [
+                {
+                    "theme_word": summary.theme_word,
+                    "completed_at": summary.completed_at.isoformat(),
+                    "n_players": summary.n_players,
+                    "top_words": [
+                        {"word": word, "value": value}
+                        for word, value in summary.top_value_by_word
+                    ],
+                    "top_players": [
+                        {"player_name": player_name, "score": score}
+                        for player_name, score in summary.top_score_by_player_name
+                    ],
+                }
+                for summary in list(reversed(aggregates.recent_rounds))[:limit]
+            ]
+        }
+
+    return aggregates_response_cache.respond(
+        request, ("history", room, limit), aggregates.version_tag, build
+    )
+
+
+@app.get("/leaderboard")
+async def leaderboard(
+    request: Request,
+    room: str = DEFAULT_ROOM,
+    period: str = "all_time",
+    offset: int = 0,
+    limit: int = 100,
+):
     """
-    runner.next_switch = dt.datetime.now(dt.timezone.utc)
+    Cumulative scores of the players, over the current day, week or all time
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail="Unknown period")
+    aggregates = get_runner(room).game.aggregates
+    # Sorted once per version, which also changes when a new period starts
+    period_leaderboard = aggregates.get_leaderboard(period, scheduler.clock.now())
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), 1000)
+
+    def build():
+        return {
+            "period": period,
+            "period_key": aggregates.period_key_by_period[period],
+            "n_players": period_leaderboard.n_players,
+            "offset": offset,
+            "standings": [
+                {"rank": rank, "player_name": player_name, "score": score}
+                for rank, player_name, score in period_leaderboard.get_page(
+                    offset, limit
+                )
+            ],
+        }
+
+    return aggregates_response_cache.respond(
+        request,
+        ("leaderboard", room, period, offset, limit),
+        aggregates.version_tag,
+        build,
+    )
+
+
+@app.get("/themes/{theme_word}/words")
+async def theme_words(
+    request: Request, theme_word: str, room: str = DEFAULT_ROOM, limit: int = 50
+):
+    """
+    Most guessed words for a theme word, across all its rounds
+    """
+    aggregates = get_runner(room).game.aggregates
+    limit = min(max(limit, 0), 1000)
+
+    def build():
+        return {
+            "theme_word": theme_word,
+            "words": [
+                {"word": word, "n_players": n_players}
+                for word, n_players in aggregates.get_word_popularity(theme_word, limit)
+            ],
+        }
+
+    return aggregates_response_cache.respond(
+        request,
+        ("theme_words", room, theme_word, limit),
+        aggregates.version_tag,
+        build,
+    )
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     Main endpoint for client connectivity
-    Updates the connection pool, sends player info and receives player guesses
+    Updates the connection pool (which notifies players of the new player count)
+    and receives player guesses
     Game state is provided once, then broadcasted directly from the game runner
+    Clients reconnecting with the session_id they were given, and the state_tag
+    of the last game state they received, resume their session
     """
+    if is_game_process:
+        await websocket.close(code=1008, reason="Connect to a websocket worker")
+        return
     player_name = websocket.query_params["player_name"]
-    print(f"Connected player: {player_name}")
+    room = websocket.query_params.get("room", DEFAULT_ROOM)
+    protocol, subprotocol = negotiate_protocol(
+        websocket.query_params.get("protocol"), websocket.scope.get("subprotocols", [])
+    )
+    try:
+        runner = room_manager.get_or_create(room)
+    except GameError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    websocket_connection_pool = runner.websocket_connection_pool
+    logger.info(
+        "Connected player",
+        extra={"event": "player_connected", "player_name": player_name, "room": room},
+    )
 
-    await websocket_connection_pool.connect(websocket)
-    await websocket_connection_pool.broadcast(
-        {
-            "type": "players_info",
-            "data": {"n_players": len(websocket_connection_pool.active_connections)},
-        }
+    resumed = await websocket_connection_pool.connect(
+        websocket,
+        player_name,
+        protocol=protocol,
+        subprotocol=subprotocol,
+        session_id=websocket.query_params.get("session_id"),
     )
+    global has_accepted_connection
+    if not has_accepted_connection:
+        has_accepted_connection = True
+        metrics.startup_to_first_connection_seconds.set(time.monotonic() - started_at)
     try:
-        await runner.personal_send_game_state(websocket=websocket)
+        # A resumed session already up to date does not need the game state again
+        if not resumed or websocket.query_params.get("state_tag") != runner.state_tag:
+            runner.personal_send_game_state(websocket=websocket)
         while True:
-            data = await websocket.receive_json()
             try:
-                # Only one type of event: set the guesses
-                runner.set_guesses(player_name=player_name, guesses=data["words"])
-            except GameError as e:
-                await websocket.send_json(
-                    {"type": "error", "data": {"message": str(e)}}
+                data = await receive_client_message(websocket, protocol)
+            except InvalidClientMessage as e:
+                websocket_connection_pool.send_personal_message(
+                    {"type": "error", "data": {"message": str(e)}}, websocket
+                )
+                continue
+            # Only one type of event: set the guesses
+            if websocket_connection_pool.allow_guesses(websocket):
+                runner.submit_guesses(
+                    player_name=player_name, guesses=data["words"], websocket=websocket
                 )
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on unexpected errors, so that the writer and session are released
         websocket_connection_pool.disconnect(websocket)
-        print(f"Disconnected player: {player_name}")
-        await websocket_connection_pool.broadcast(
-            {
-                "type": "players_info",
-                "data": {
-                    "n_players": len(websocket_connection_pool.active_connections)
-                },
-            }
+        logger.info(
+            "Disconnected player",
+            extra={
+                "event": "player_disconnected",
+                "player_name": player_name,
+                "room": room,
+            },
         )
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import json
+import struct
+from typing import Callable, Union
+
+from src.log import get_logger
+
+logger = get_logger("broker")
+
+# Frames are JSON objects, prefixed by their length as a 4 bytes big-endian integer
+FRAME_HEADER = struct.Struct(">I")
+
+WorkerId = int
+HubMessageHandler = Callable[[WorkerId, dict], None]
+WorkerMessageHandler = Callable[[dict], None]
+
+
+def encode_frame(frame: dict) -> bytes:
+    payload = json.dumps(frame, separators=(",", ":"), ensure_ascii=False).encode()
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    return json.loads(await reader.readexactly(length))
+
+
+class UnixSocketBrokerHub:
+    """
+    Runs in the game process: publishes frames to the websocket workers
+    connected on the Unix socket, and receives their frames
+    When a worker goes away, the handler receives a {"kind": "worker_lost"} frame
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer_by_worker_id: dict[WorkerId, asyncio.StreamWriter] = {}
+        self._worker_ids = itertools.count()
+        self._on_message: Union[HubMessageHandler, None] = None
+        self._server: Union[asyncio.AbstractServer, None] = None
+
+    async def start(self, on_message: HubMessageHandler) -> None:
+        self._on_message = on_message
+        self._server = await asyncio.start_unix_server(
+            self._handle_worker, path=self.path
+        )
+
+    async def _handle_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        worker_id = next(self._worker_ids)
+        self._writer_by_worker_id[worker_id] = writer
+        try:
+            while True:
+                frame = await read_frame(reader)
+                try:
+                    self._on_message(worker_id, frame)
+                except Exception:
+                    logger.exception(
+                        "Broker frame handling failed",
+                        extra={"event": "broker_frame_failed", "worker_id": worker_id},
+                    )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._writer_by_worker_id[worker_id]
+            self._on_message(worker_id, {"kind": "worker_lost"})
+            writer.close()
+
+    def publish(self, frame: dict, worker_id: Union[WorkerId, None] = None) -> None:
+        """
+        Send the frame to one worker, or to all of them
+        Writes are buffered by the transport, so this never waits
+        """
+        data = encode_frame(frame)
+        if worker_id is None:
+            writers = list(self._writer_by_worker_id.values())
+        elif worker_id in self._writer_by_worker_id:
+            writers = [self._writer_by_worker_id[worker_id]]
+        else:
+            writers = []
+        for writer in writers:
+            writer.write(data)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class UnixSocketBrokerClient:
+    """
+    Runs in a websocket worker: connects to the hub of the game process,
+    reconnecting if it goes away
+    on_connected is called after each (re)connection, so that the worker can
+    register its connections again
+    """
+
+    reconnect_delay_seconds = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Union[asyncio.StreamWriter, None] = None
+        self._task: Union[asyncio.Task, None] = None
+
+    async def connect(
+        self,
+        on_message: WorkerMessageHandler,
+        on_connected: Callable[[], None] = lambda: None,
+    ) -> None:
+        self._task = asyncio.create_task(self._run(on_message, on_connected))
+
+    async def _run(
+        self, on_message: WorkerMessageHandler, on_connected: Callable[[], None]
+    ) -> None:
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                on_connected()
+                while True:
+                    frame = await read_frame(reader)
+                    try:
+                        on_message(frame)
+                    except Exception:
+                        # A failing frame must not stop the relay of the others
+                        logger.exception(
+                            "Broker frame handling failed",
+                            extra={"event": "broker_frame_failed"},
+                        )
+            except (asyncio.IncompleteReadError, ConnectionError, FileNotFoundError):
+                self._writer = None
+                await asyncio.sleep(self.reconnect_delay_seconds)
+
+    def send(self, frame: dict) -> None:
+        # Frames sent while disconnected are dropped, the worker registers
+        # its connections again when reconnected
+        if self._writer is not None:
+            self._writer.write(encode_frame(frame))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+class LocalBrokerHub:
+    """
+    In-process stand-in for UnixSocketBrokerHub, for tests and single-process runs
+    Frames still go through the JSON encoding and are delivered asynchronously
+    """
+
+    def __init__(self):
+        self._client_by_worker_id: dict[WorkerId, "LocalBrokerClient"] = {}
+        self._worker_ids = itertools.count()
+        self._on_message: Union[HubMessageHandler, None] = None
+
+    async def start(self, on_message: HubMessageHandler) -> None:
+        self._on_message = on_message
+
+    def client(self) -> "LocalBrokerClient":
+        return LocalBrokerClient(hub=self)
+
+    def _register(self, client: "LocalBrokerClient") -> WorkerId:
+        worker_id = next(self._worker_ids)
+        self._client_by_worker_id[worker_id] = client
+        return worker_id
+
+    def _unregister(self, worker_id: WorkerId) -> None:
+        del self._client_by_worker_id[worker_id]
+        self._deliver(worker_id, {"kind": "worker_lost"})
+
+    def _deliver(self, worker_id: WorkerId, frame: dict) -> None:
+        asyncio.get_running_loop().call_soon(
+            self._on_message, worker_id, json.loads(json.dumps(frame))
+        )
+
+    def publish(self, frame: dict, worker_id: Union[WorkerId, None] = None) -> None:
+        if worker_id is None:
+            clients = list(self._client_by_worker_id.values())
+        elif worker_id in self._client_by_worker_id:
+            clients = [self._client_by_worker_id[worker_id]]
+        else:
+            clients = []
+        for client in clients:
+            client._deliver(frame)
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBrokerClient:
+    def __init__(self, hub: LocalBrokerHub):
+        self.hub = hub
+        self.worker_id: Union[WorkerId, None] = None
+        self._on_message: Union[WorkerMessageHandler, None] = None
+
+    async def connect(
+        self,
+        on_message: WorkerMessageHandler,
+        on_connected: Callable[[], None] = lambda: None,
+    ) -> None:
+        self._on_message = on_message
+        self.worker_id = self.hub._register(self)
+        on_connected()
+
+    def _deliver(self, frame: dict) -> None:
+        asyncio.get_running_loop().call_soon(
+            self._on_message, json.loads(json.dumps(frame))
+        )
+
+    def send(self, frame: dict) -> None:
+        if self.worker_id is not None:
+            self.hub._deliver(self.worker_id, frame)
+
+    async def close(self) -> None:
+        if self.worker_id is not None:
+            self.hub._unregister(self.worker_id)
+            self.worker_id = None
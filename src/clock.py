@@ -0,0 +1,39 @@
+import datetime as dt
+from typing import Union
+
+
+class Clock:
+    """
+    Wall clock time, in UTC
+    Injected wherever the game reads the time, so that it can be replaced
+    by a VirtualClock to play rounds without waiting
+    """
+
+    def now(self) -> dt.datetime:
+        return dt.datetime.now(dt.timezone.utc)
+
+
+class VirtualClock(Clock):
+    """
+    Time only moves forward when advanced
+    """
+
+    def __init__(self, start: Union[dt.datetime, None] = None):
+        self.start = (
+            start
+            if start is not None
+            else dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+        )
+        self._now = self.start
+
+    def now(self) -> dt.datetime:
+        return self._now
+
+    def advance_to(self, moment: dt.datetime) -> None:
+        self._now = max(self._now, moment)
+
+    def advance(self, seconds: float) -> None:
+        self._now += dt.timedelta(seconds=seconds)
+
+
+WALL_CLOCK = Clock()
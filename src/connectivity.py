@@ -1,28 +1,391 @@
+import asyncio
+import dataclasses
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Hashable, Union
+
 from starlette.websockets import WebSocket
 from uvicorn.protocols.utils import ClientDisconnected
 
+from src import metrics
+from src.domain.entities import PlayerName
+from src.messages import JSON_PROTOCOL, MSGPACK_PROTOCOL, EncodedMessage
+from src.rate_limit import TokenBucket
+
+# A pending message of these types is replaced by a newer message of the same type
+SUPERSEDABLE_MESSAGE_TYPES = {
+    "game_state",
+    "players_info",
+    "personal_result",
+    "round_progress",
+}
+
+
+class InvalidClientMessage(Exception):
+    pass
+
+
+async def receive_client_message(websocket: WebSocket, protocol: str) -> dict:
+    """
+    Guesses of the client, InvalidClientMessage if the frame cannot be decoded
+    or has no list of words
+    """
+    try:
+        if protocol == MSGPACK_PROTOCOL:
+            import msgpack
+
+            data = msgpack.unpackb(await websocket.receive_bytes())
+        else:
+            data = await websocket.receive_json()
+    except (ValueError, KeyError, TypeError) as e:
+        # KeyError for a text frame where bytes are expected, or the reverse
+        raise InvalidClientMessage("Invalid message") from e
+    words = data.get("words") if isinstance(data, dict) else None
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        raise InvalidClientMessage("Invalid message: expected a list of words")
+    return data
+
+
+@dataclasses.dataclass(eq=False)
+class Session:
+    """
+    A player across connections, identified by an id issued by the server
+    that the client sends back when reconnecting
+    """
+
+    session_id: str
+    player_name: PlayerName
+    websocket: Union[WebSocket, None] = None
+    # Pending removal of the session once disconnected, cancelled if it is resumed
+    expiry: Union[asyncio.TimerHandle, None] = None
+
+
+@dataclasses.dataclass
+class BroadcastReport:
+    n_connections: int
+    n_failed: int
+    duration_seconds: float
+
+
+class ConnectionWriter:
+    """
+    Sends the messages of one connection from its own task, so that senders
+    never wait on a slow client
+    Pending messages are kept in a small bounded queue, where a newer message
+    replaces any pending message of the same supersedable type
+    """
+
+    # Must be larger than the number of supersedable message types
+    max_pending_messages = 8
+    # A client with a full queue for longer than this is disconnected
+    max_overflow_seconds = 10.0
+    # A send that takes longer than this is considered stuck
+    send_timeout_seconds = 5.0
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_failure: Callable[[], None],
+        protocol: str = JSON_PROTOCOL,
+    ):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.on_failure = on_failure
+        self.pending: OrderedDict[Hashable, EncodedMessage] = OrderedDict()
+        self.overflowing_since: Union[float, None] = None
+        self._sequence = itertools.count()
+        self._has_pending = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run())
+
+    def enqueue(self, message: EncodedMessage) -> bool:
+        """
+        Queue the message without waiting, returns False if the client
+        has not kept up for too long and should be disconnected
+        """
+        if message.type in SUPERSEDABLE_MESSAGE_TYPES:
+            key = message.type
+            if key in self.pending:
+                # Replaced in place, keeping its position in the queue
+                self.pending[key] = message
+                return True
+        else:
+            key = next(self._sequence)
+
+        if len(self.pending) >= self.max_pending_messages:
+            now = time.monotonic()
+            if self.overflowing_since is None:
+                self.overflowing_since = now
+            elif now - self.overflowing_since > self.max_overflow_seconds:
+                return False
+            # Keep memory bounded by dropping the oldest message that cannot be
+            # superseded, as there can only be one pending message of each other
+            # type, or the oldest message if they can all be superseded
+            oldest_key = next(
+                (key for key in self.pending if isinstance(key, int)),
+                next(iter(self.pending)),
+            )
+            del self.pending[oldest_key]
+
+        self.pending[key] = message
+        self._has_pending.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            while len(self.pending) > 0:
+                _, message = self.pending.popitem(last=False)
+                if len(self.pending) < self.max_pending_messages:
+                    self.overflowing_since = None
+                if self.protocol == MSGPACK_PROTOCOL:
+                    send = self.websocket.send_bytes(message.msgpack)
+                else:
+                    send = self.websocket.send_text(message.text)
+                try:
+                    await asyncio.wait_for(send, timeout=self.send_timeout_seconds)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self.on_failure()
+                    return
+            self._has_pending.clear()
+
+    def stop(self):
+        self.task.cancel()
+
 
 class WebsocketConnectionPool:
     """
     Maintains a list of connected users to enable broadcasting game state and other info
+    Sending only queues messages on the writer of each connection
     """
 
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    # Connections and disconnections within this interval are reported to
+    # the players in a single players_info broadcast
+    presence_interval_seconds = 1.0
+    # A disconnected session can be resumed within this delay, and still
+    # counts as a player until then
+    session_resume_seconds = 30.0
+    # Guess submissions allowed per connection, with bursts up to guess_burst
+    guess_rate_per_second = 5.0
+    guess_burst = 10
+
+    def __init__(self, report_presence: bool = True):
+        # Pools relaying messages from another process leave presence
+        # and sessions to that process
+        self.report_presence = report_presence
+        # Dicts are used as ordered sets, for constant time removal
+        self.active_connections: dict[WebSocket, Union[Session, None]] = {}
+        self.player_name_by_websocket: dict[WebSocket, PlayerName] = {}
+        self.websockets_by_player_name: dict[PlayerName, dict[WebSocket, None]] = {}
+        self.session_by_id: dict[str, Session] = {}
+        self.writer_by_websocket: dict[WebSocket, ConnectionWriter] = {}
+        self.rate_limit_by_websocket: dict[WebSocket, TokenBucket] = {}
+        # Connections told that they are rate limited, until they are allowed again
+        self.rate_limited_websockets: set[WebSocket] = set()
+        # Monotonic time of the last connection or disconnection, to find idle pools
+        self.last_activity = time.monotonic()
+        self._presence_broadcast_task: Union[asyncio.Task, None] = None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        player_name: PlayerName,
+        protocol: str = JSON_PROTOCOL,
+        subprotocol: Union[str, None] = None,
+        session_id: Union[str, None] = None,
+    ) -> bool:
+        """
+        Accept the connection and register it, returns whether a session was resumed
+        """
+        await websocket.accept(subprotocol=subprotocol)
+        self.writer_by_websocket[websocket] = ConnectionWriter(
+            websocket, on_failure=lambda: self._evict(websocket), protocol=protocol
+        )
+        self.rate_limit_by_websocket[websocket] = TokenBucket(
+            self.guess_rate_per_second, self.guess_burst
+        )
+        return self.register(websocket, player_name, session_id)
+
+    def register(
+        self,
+        websocket: WebSocket,
+        player_name: PlayerName,
+        session_id: Union[str, None] = None,
+    ) -> bool:
+        """
+        Add the connection and resume the given session, or open a new one
+        whose id is sent to the client so that it can resume it later
+        The player count is sent to the new player only, the other players
+        are notified by the next presence broadcast if it has changed
+        """
+        self.active_connections[websocket] = None
+        self.player_name_by_websocket[websocket] = player_name
+        self.websockets_by_player_name.setdefault(player_name, {})[websocket] = None
+        self.last_activity = time.monotonic()
+        if not self.report_presence:
+            return False
+
+        session = self.session_by_id.get(session_id) if session_id else None
+        resumed = session is not None and session.player_name == player_name
+        if resumed:
+            metrics.resumed_sessions_total.inc()
+            if session.expiry is not None:
+                session.expiry.cancel()
+                session.expiry = None
+            if session.websocket is not None:
+                # The same session in another tab: only the latest one is kept
+                metrics.multi_tab_connections_total.inc()
+                self.active_connections[session.websocket] = None
+                self._close(session.websocket, reason="Connected from another tab")
+        else:
+            session = Session(session_id=str(uuid.uuid4()), player_name=player_name)
+            self.session_by_id[session.session_id] = session
+        session.websocket = websocket
+        self.active_connections[websocket] = session
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+        if not resumed:
+            self.send_personal_message(
+                {"type": "session", "data": {"session_id": session.session_id}},
+                websocket,
+            )
+        self.send_personal_message(self.players_info_message, websocket)
+        if not resumed:
+            self.notify_presence_changed()
+        return resumed
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        """
+        The session of the connection can be resumed for a while,
+        it is then removed and the other players notified
+        """
+        # A socket may already have been evicted by a failed send
+        # before its receive loop notices the disconnection
+        if websocket not in self.active_connections:
+            return
+        session = self.active_connections.pop(websocket)
+        player_name = self.player_name_by_websocket.pop(websocket)
+        websockets = self.websockets_by_player_name[player_name]
+        del websockets[websocket]
+        if len(websockets) == 0:
+            del self.websockets_by_player_name[player_name]
+        writer = self.writer_by_websocket.pop(websocket, None)
+        if writer is not None:
+            writer.stop()
+        self.rate_limit_by_websocket.pop(websocket, None)
+        self.rate_limited_websockets.discard(websocket)
+        self.last_activity = time.monotonic()
+        if session is not None and session.websocket is websocket:
+            session.websocket = None
+            session.expiry = asyncio.get_running_loop().call_later(
+                self.session_resume_seconds, self._expire_session, session
+            )
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
+    def _expire_session(self, session: "Session"):
+        del self.session_by_id[session.session_id]
+        self.last_activity = time.monotonic()
+        self.notify_presence_changed()
+
+    @property
+    def players_info_message(self) -> dict:
+        return {
+            "type": "players_info",
+            "data": {"n_players": len(self.session_by_id)},
+        }
+
+    def allow_guesses(self, websocket: WebSocket) -> bool:
+        """
+        Consume from the rate limit of the connection. When it is exceeded,
+        the client gets an error, only once until it is allowed again
+        """
+        rate_limit = self.rate_limit_by_websocket.get(websocket)
+        if rate_limit is None or rate_limit.try_consume():
+            self.rate_limited_websockets.discard(websocket)
+            return True
+        metrics.rate_limited_guesses_total.inc()
+        if websocket not in self.rate_limited_websockets:
+            self.rate_limited_websockets.add(websocket)
+            self.send_personal_message(
+                {"type": "error", "data": {"message": "Too many guesses, slow down"}},
+                websocket,
+            )
+        return False
+
+    def notify_presence_changed(self):
+        """
+        Schedule a players_info broadcast, unless one is already scheduled
+        so that a burst of connections costs a single broadcast
+        """
+        if self._presence_broadcast_task is None:
+            self._presence_broadcast_task = asyncio.ensure_future(
+                self._broadcast_presence_later()
+            )
+
+    async def _broadcast_presence_later(self):
+        try:
+            await asyncio.sleep(self.presence_interval_seconds)
+        finally:
+            self._presence_broadcast_task = None
+        self.broadcast(self.players_info_message)
+
+    def _evict(self, websocket: WebSocket):
+        metrics.evicted_sockets_total.inc()
+        self.disconnect(websocket)
+        # So that the client notices and can reconnect
+        self._close(websocket)
+
+    def _close(self, websocket: WebSocket, reason: Union[str, None] = None):
+        """
+        Close the connection in the background, its receive loop then disconnects it
+        """
+        asyncio.ensure_future(self._close_quietly(websocket, reason))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, reason: Union[str, None]):
         try:
-            await websocket.send_json(message)
+            if reason is None:
+                await websocket.close()
+            else:
+                await websocket.close(code=1008, reason=reason)
         except Exception:
-            self.disconnect(websocket)
+            pass
+
+    def send_personal_message(
+        self, message: Union[dict, EncodedMessage], websocket: WebSocket
+    ):
+        if isinstance(message, dict):
+            message = EncodedMessage(message)
+        self.send_many([(websocket, message)])
+
+    def send_many(
+        self, messages: list[tuple[WebSocket, EncodedMessage]]
+    ) -> BroadcastReport:
+        """
+        Queue each message on the writer of its connection, evicting the
+        connections that have not kept up with their queue for too long
+        """
+        start = time.perf_counter()
+        failed_connections = []
+        for connection, message in messages:
+            writer = self.writer_by_websocket.get(connection)
+            if writer is not None and not writer.enqueue(message):
+                failed_connections.append(connection)
+        for connection in failed_connections:
+            self._evict(connection)
+        return BroadcastReport(
+            n_connections=len(messages),
+            n_failed=len(failed_connections),
+            duration_seconds=time.perf_counter() - start,
+        )
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await self.send_personal_message(message, connection)
+    def broadcast(self, message: Union[dict, EncodedMessage]) -> BroadcastReport:
+        """
+        Send the message to all connections, encoded once for all of them
+        """
+        if isinstance(message, dict):
+            message = EncodedMessage(message)
+        return self.send_many(
+            [(connection, message) for connection in self.active_connections]
+        )
@@ -0,0 +1,143 @@
+import dataclasses
+import datetime as dt
+import heapq
+import uuid
+from collections import deque
+from typing import Tuple
+
+from src.domain.entities import PlayerName, Round, RoundId, RoundResult
+from src.domain.standings import Leaderboard
+
+# Cumulative leaderboards, reset when a new day or ISO week starts
+PERIODS = ("daily", "weekly", "all_time")
+
+
+def get_period_key(period: str, moment: dt.datetime) -> str:
+    if period == "daily":
+        return moment.date().isoformat()
+    if period == "weekly":
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    return "all_time"
+
+
+@dataclasses.dataclass(slots=True)
+class RoundSummary:
+    round_id: RoundId
+    theme_word: str
+    completed_at: dt.datetime
+    n_players: int
+    top_value_by_word: list[Tuple[str, int]]
+    top_score_by_player_name: list[Tuple[PlayerName, int]]
+
+
+class GameAggregates:
+    """
+    Statistics across rounds, updated once per completed round so that
+    reading them never goes through the guesses again:
+    - summaries of the latest rounds
+    - cumulative scores of the players for each period
+    - number of players having guessed each word, by theme word
+    """
+
+    history_size = 50
+    # Number of words and players kept in each round summary
+    summary_size = 10
+
+    def __init__(self):
+        self.recent_rounds: deque[RoundSummary] = deque(maxlen=self.history_size)
+        self.period_key_by_period: dict[str, str] = {}
+        self.score_by_player_name_by_period: dict[str, dict[PlayerName, int]] = {
+            period: {} for period in PERIODS
+        }
+        self.word_counts_by_theme: dict[str, dict[str, int]] = {}
+        # Spelling shown for the canonical words counted above that differ from it
+        self.spelling_by_word_by_theme: dict[str, dict[str, str]] = {}
+        # Incremented on each change, the identifier distinguishes the aggregates
+        # of a room from those of a room created again with the same name
+        self.identifier = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._leaderboard_cache: dict[str, Tuple[int, Leaderboard]] = {}
+
+    @property
+    def version_tag(self) -> str:
+        return f"{self.identifier}-{self.version}"
+
+    def _roll_period(self, period: str, moment: dt.datetime) -> None:
+        period_key = get_period_key(period, moment)
+        if self.period_key_by_period.get(period) != period_key:
+            self.period_key_by_period[period] = period_key
+            self.score_by_player_name_by_period[period] = {}
+            self.version += 1
+
+    def add_round_result(
+        self, completed_round: Round, result: RoundResult, completed_at: dt.datetime
+    ) -> None:
+        for period in PERIODS:
+            self._roll_period(period, completed_at)
+            score_by_player_name = self.score_by_player_name_by_period[period]
+            for player_name, score in result.score_by_player_name.items():
+                score_by_player_name[player_name] = (
+                    score_by_player_name.get(player_name, 0) + score
+                )
+
+        word_counts = self.word_counts_by_theme.setdefault(
+            completed_round.theme_word, {}
+        )
+        for word, value in result.value_by_word.items():
+            # The value of a word is the number of players having guessed it, minus one
+            word_counts[word] = word_counts.get(word, 0) + value + 1
+        if len(result.spelling_by_word) > 0:
+            spellings = self.spelling_by_word_by_theme.setdefault(
+                completed_round.theme_word, {}
+            )
+            for word, spelling in result.spelling_by_word.items():
+                spellings.setdefault(word, spelling)
+
+        self.recent_rounds.append(
+            RoundSummary(
+                round_id=completed_round.round_id,
+                theme_word=completed_round.theme_word,
+                completed_at=completed_at,
+                n_players=len(result.score_by_player_name),
+                top_value_by_word=[
+                    (result.display_word(word), value)
+                    for word, value in heapq.nlargest(
+                        self.summary_size,
+                        result.value_by_word.items(),
+                        key=lambda item: item[1],
+                    )
+                ],
+                top_score_by_player_name=heapq.nlargest(
+                    self.summary_size,
+                    result.score_by_player_name.items(),
+                    key=lambda item: item[1],
+                ),
+            )
+        )
+        self.version += 1
+
+    def get_leaderboard(self, period: str, now: dt.datetime) -> Leaderboard:
+        """
+        Sorted once per version of the aggregates
+        """
+        self._roll_period(period, now)
+        cached = self._leaderboard_cache.get(period)
+        if cached is None or cached[0] != self.version:
+            cached = (
+                self.version,
+                Leaderboard(self.score_by_player_name_by_period[period]),
+            )
+            self._leaderboard_cache[period] = cached
+        return cached[1]
+
+    def get_word_popularity(self, theme_word: str, limit: int) -> list[Tuple[str, int]]:
+        spellings = self.spelling_by_word_by_theme.get(theme_word, {})
+        return [
+            (spellings.get(word, word), count)
+            for word, count in heapq.nlargest(
+                limit,
+                self.word_counts_by_theme.get(theme_word, {}).items(),
+                key=lambda item: item[1],
+            )
+        ]
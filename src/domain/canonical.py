@@ -0,0 +1,136 @@
+import functools
+import unicodedata
+from typing import Callable, Iterable, Union
+
+# Articles and pronouns elided before a vowel: "l'arbre", "qu'il"
+ELIDED_PREFIXES = ("qu'", "l'", "d'", "j'", "m'", "n'", "s'", "t'", "c'")
+
+
+def compose(word: str) -> str:
+    """Unicode NFC, so that "é" is the same word whether sent as one or two code points"""
+    return unicodedata.normalize("NFC", word)
+
+
+def remove_elision(word: str) -> str:
+    word = word.replace("’", "'")
+    for prefix in ELIDED_PREFIXES:
+        if word.startswith(prefix) and len(word) > len(prefix):
+            return word[len(prefix) :].strip()
+    return word
+
+
+def fold_accents(word: str) -> str:
+    decomposed = unicodedata.normalize("NFD", word)
+    return "".join(
+        character for character in decomposed if not unicodedata.combining(character)
+    )
+
+
+# Words ending in s or x that are not plurals, or whose singular is spelled
+# the same. Without accents, as plurals are removed after the accents
+INVARIANT_WORDS = frozenset("""
+    abus ananas anglais autobus autrefois avis bois bonus bras cactus cadenas
+    campus chaux choix colis compas concours corps cours croix dessous dessus
+    deux discours doux epoux faux fils fois frais francais houx iris jaloux
+    jamais lilas marais matelas mepris mieux mois noix oasis ours paix palais
+    paradis parcours parfois paris pays perdrix permis poids prix proces
+    progres puits radis refus relais remords repas roux secours sens souris
+    succes tapis taux temps tennis terminus toux travers univers velours vieux
+    virus voix
+    """.split())
+# Plurals in -aux whose singular does not end in -al
+SINGULAR_BY_IRREGULAR_PLURAL = {
+    "baux": "bail",
+    "boyaux": "boyau",
+    "coraux": "corail",
+    "emaux": "email",
+    "joyaux": "joyau",
+    "noyaux": "noyau",
+    "soupiraux": "soupirail",
+    "travaux": "travail",
+    "tuyaux": "tuyau",
+    "vantaux": "vantail",
+    "vitraux": "vitrail",
+}
+
+
+def remove_plural(word: str) -> str:
+    """
+    Simple French plurals: "chevaux" -> "cheval", "bateaux" -> "bateau",
+    "chats" -> "chat". Short and invariant words are left as is
+    """
+    if len(word) <= 3 or word in INVARIANT_WORDS:
+        return word
+    if word in SINGULAR_BY_IRREGULAR_PLURAL:
+        return SINGULAR_BY_IRREGULAR_PLURAL[word]
+    if word.endswith("aux") and not word.endswith("eaux"):
+        return word[:-3] + "al"
+    if word.endswith(("eaux", "eux", "oux")):
+        return word[:-1]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def is_valid_word(word: str) -> bool:
+    """Can be stored in a GuessList"""
+    return len(word) > 0 and word == word.lower().strip()
+
+
+DEFAULT_STEPS: tuple[Callable[[str], str], ...] = (
+    compose,
+    remove_elision,
+    fold_accents,
+    remove_plural,
+)
+
+
+class Canonicalizer:
+    """
+    Maps the words guessed by the players to a canonical form, so that
+    spelling variants of a word ("café" and "cafe", "chats" and "chat") are
+    scored as the same word
+    Each distinct word goes through the steps once, then is read from a
+    bounded LRU cache
+    """
+
+    cache_size = 100_000
+
+    def __init__(
+        self,
+        steps: Iterable[Callable[[str], str]] = DEFAULT_STEPS,
+        alias_by_word: Union[dict[str, str], None] = None,
+        cache_size: Union[int, None] = None,
+    ):
+        if cache_size is not None:
+            self.cache_size = cache_size
+        self.steps = tuple(steps)
+        # Aliases are applied to canonical forms, so that they match
+        # whatever the spelling of the guess
+        self.alias_by_word = {}
+        for word, alias in (alias_by_word or {}).items():
+            if not isinstance(word, str) or not isinstance(alias, str):
+                raise ValueError(f"Invalid alias: {word!r} -> {alias!r}")
+            canonical_word = self._apply_steps(word.lower().strip())
+            canonical_alias = self._apply_steps(alias.lower().strip())
+            if not is_valid_word(canonical_word) or not is_valid_word(canonical_alias):
+                raise ValueError(f"Invalid alias: {word!r} -> {alias!r}")
+            self.alias_by_word[canonical_word] = canonical_alias
+        self.canonicalize = functools.lru_cache(maxsize=self.cache_size)(
+            self._canonicalize
+        )
+
+    def _apply_steps(self, word: str) -> str:
+        for step in self.steps:
+            word = step(word)
+        return word
+
+    def _canonicalize(self, word: str) -> str:
+        canonical_word = self._apply_steps(word)
+        canonical_word = self.alias_by_word.get(canonical_word, canonical_word)
+        # Canonical words are stored as guesses, words whose steps do not give
+        # a valid guess (such as only an elided prefix) are kept as is
+        return canonical_word if is_valid_word(canonical_word) else word
+
+
+DEFAULT_CANONICALIZER = Canonicalizer()
@@ -1,4 +1,5 @@
 import dataclasses
+from collections import deque
 from uuid import UUID
 
 from src.domain.constants import N_GUESSES
@@ -11,20 +12,38 @@ class GameError(Exception):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Round:
     round_id: RoundId
     theme_word: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RoundResult:
     score_by_player_name: dict[str, int]
+    # Keyed by the canonical form of the words
     value_by_word: dict[str, int]
+    # Spelling received for the canonical words that differ from it, for display
+    spelling_by_word: dict[str, str] = dataclasses.field(
+        default_factory=dict, compare=False
+    )
+
+    def display_word(self, word: str) -> str:
+        return self.spelling_by_word.get(word, word)
+
+
+@dataclasses.dataclass(slots=True)
+class RoundProgress:
+    n_submissions: int
+    n_distinct_words: int
+    # Most guessed words with their number of players, most guessed first
+    top_word_counts: list[tuple[str, int]]
 
 
 class GuessList:
-    """A list of 0 to N_GUESSES distinct words"""
+    """A list of 0 to N_GUESSES distinct words, stored as a tuple"""
+
+    __slots__ = ("words",)
 
     def __init__(self, words: list[str]):
         words_processed = [word.lower().strip() for word in words]
@@ -36,14 +55,21 @@ class GuessList:
             raise GameError("Too many guesses")
         if len(set(words_processed)) != len(words_processed):
             raise GameError("Some words are identical")
-        self.words = words_processed
+        self.words: tuple[str, ...] = tuple(words_processed)
 
     def __repr__(self):
         return f"GuessList({self.words})"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class GameState:
-    rounds: list[Round]
+    # Oldest first, bounded by the store
+    rounds: deque[Round]
     result_by_round: dict[RoundId, RoundResult]
     guesses_by_round_and_player_name: dict[RoundId, dict[PlayerName, GuessList]]
+    # Running count of players having guessed each word, kept up to date on each guess
+    word_counts_by_round: dict[RoundId, dict[str, int]]
+    # One instance of each word guessed in the round, shared by all the guess lists
+    vocabulary_by_round: dict[RoundId, dict[str, str]]
+    # First spelling received for the canonical words that differ from it
+    spelling_by_round: dict[RoundId, dict[str, str]]
@@ -1,18 +1,38 @@
+import heapq
 import uuid
 import random
 from collections import defaultdict
-from typing import Union, Tuple
+from typing import Union, Tuple, Optional, Callable
 
+from src.clock import WALL_CLOCK, Clock
 from src.state_store import StateStore
-from src.domain.entities import Round, PlayerName, GuessList, GameError, RoundResult
+from src.domain.entities import (
+    Round,
+    PlayerName,
+    GuessList,
+    GameError,
+    RoundResult,
+    RoundProgress,
+)
+from src.domain.aggregates import GameAggregates
+from src.domain.canonical import DEFAULT_CANONICALIZER, Canonicalizer
 from src.domain.constants import THEME_WORDS
+from src.domain.scoring import compute_round_result_vectorized
 
 
-def compute_round_result(guesses_by_player: dict[PlayerName, GuessList]) -> RoundResult:
-    word_counts = defaultdict(int)
-    for guess_list in guesses_by_player.values():
-        for word in guess_list.words:
-            word_counts[word] += 1
+def compute_round_result(
+    guesses_by_player: dict[PlayerName, GuessList],
+    word_counts: Optional[dict[str, int]] = None,
+) -> RoundResult:
+    """
+    word_counts can be provided if the number of players having guessed
+    each word is already known, to avoid counting again
+    """
+    if word_counts is None:
+        word_counts = defaultdict(int)
+        for guess_list in guesses_by_player.values():
+            for word in guess_list.words:
+                word_counts[word] += 1
     word_point_values = {k: v - 1 for k, v in word_counts.items()}
     score_by_player_name = {}
     for player_name, guess_list in guesses_by_player.items():
@@ -23,13 +43,42 @@ def compute_round_result(guesses_by_player: dict[PlayerName, GuessList]) -> Roun
     )
 
 
+ScoringEngine = Callable[
+    [dict[PlayerName, GuessList], Optional[dict[str, int]]], RoundResult
+]
+
+SCORING_ENGINES: dict[str, ScoringEngine] = {
+    "python": compute_round_result,
+    # Requires numpy, faster for rounds with tens of thousands of players
+    "numpy": compute_round_result_vectorized,
+}
+
+
 class Game:
     """
     Holds the full game logic: theme selection, guess storage, scoring
     """
 
-    def __init__(self, state: StateStore):
+    def __init__(
+        self,
+        state: StateStore,
+        scoring_engine: str = "python",
+        aggregates: Optional[GameAggregates] = None,
+        clock: Clock = WALL_CLOCK,
+        canonicalizer: Optional[Canonicalizer] = DEFAULT_CANONICALIZER,
+    ):
         self.state = state
+        self.clock = clock
+        # Guesses are scored by their canonical form, None to score them as sent
+        self.canonicalizer = canonicalizer
+        # Cross-round statistics, updated when a round completes
+        self.aggregates = aggregates
+        if scoring_engine not in SCORING_ENGINES:
+            raise ValueError(f"Unknown scoring engine: {scoring_engine}")
+        self.compute_round_result = SCORING_ENGINES[scoring_engine]
+        # Incremented whenever a round starts or completes, so that
+        # anything derived from the game state can be cached in between
+        self.state_version = 0
 
     @property
     def has_ongoing_round(self) -> bool:
@@ -50,6 +99,7 @@ class Game:
                 theme_word=random.choice(THEME_WORDS),
             )
         )
+        self.state_version += 1
 
     def set_guesses(self, player_name: PlayerName, guess_list: GuessList):
         latest_round = self.state.get_latest_round()
@@ -59,12 +109,33 @@ class Game:
         ):
             raise GameError("Cannot set guesses as there is no ongoing round")
 
+        if self.canonicalizer is not None:
+            guess_list.words, spelling_by_word = self._canonicalize(guess_list.words)
+            if len(spelling_by_word) > 0:
+                self.state.add_spellings(latest_round.round_id, spelling_by_word)
         self.state.set_player_guesses(
             round_id=latest_round.round_id,
             player_name=player_name,
             guess_list=guess_list,
         )
 
+    def _canonicalize(
+        self, words: tuple[str, ...]
+    ) -> Tuple[tuple[str, ...], dict[str, str]]:
+        """
+        Canonical words, variants of the same word in a guess list counting once,
+        and the spelling of those that differ from their canonical form
+        """
+        canonical_words = []
+        spelling_by_word = {}
+        for word in words:
+            canonical_word = self.canonicalizer.canonicalize(word)
+            if canonical_word not in canonical_words:
+                canonical_words.append(canonical_word)
+                if canonical_word != word:
+                    spelling_by_word[canonical_word] = word
+        return tuple(canonical_words), spelling_by_word
+
     def complete_current_round(self):
         latest_round = self.state.get_latest_round()
         if (
@@ -74,8 +145,39 @@ class Game:
             raise GameError("Cannot complete round as there is no ongoing round")
 
         guesses_by_player = self.state.get_all_guesses_for_round(latest_round.round_id)
-        result = compute_round_result(guesses_by_player)
+        word_counts = self.state.get_word_counts_for_round(latest_round.round_id)
+        result = self.compute_round_result(guesses_by_player, word_counts)
+        result.spelling_by_word = self.state.get_spellings_for_round(
+            latest_round.round_id
+        )
         self.state.add_round_result(round_id=latest_round.round_id, result=result)
+        if self.aggregates is not None:
+            self.aggregates.add_round_result(
+                latest_round, result, completed_at=self.clock.now()
+            )
+        self.state_version += 1
+
+    def get_round_progress(self, n_top_words: int) -> Union[RoundProgress, None]:
+        """
+        Progress of the ongoing round, read from the word counts kept up to date
+        by set_guesses: the cost depends on the number of distinct words,
+        not on the number of guesses received
+        """
+        if not self.has_ongoing_round:
+            return None
+        round_id = self.state.get_latest_round().round_id
+        word_counts = self.state.get_word_counts_for_round(round_id)
+        spelling_by_word = self.state.get_spellings_for_round(round_id)
+        return RoundProgress(
+            n_submissions=len(self.state.get_all_guesses_for_round(round_id)),
+            n_distinct_words=len(word_counts),
+            top_word_counts=[
+                (spelling_by_word.get(word, word), count)
+                for word, count in heapq.nlargest(
+                    n_top_words, word_counts.items(), key=lambda item: item[1]
+                )
+            ],
+        )
 
     def get_game_state(self) -> Tuple[Union[Round, None], Union[RoundResult, None]]:
         latest_round = self.state.get_latest_round()
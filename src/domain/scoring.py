@@ -0,0 +1,60 @@
+from typing import Optional
+
+from src.domain.constants import N_GUESSES
+from src.domain.entities import PlayerName, GuessList, RoundResult
+
+
+def compute_round_result_vectorized(
+    guesses_by_player: dict[PlayerName, GuessList],
+    word_counts: Optional[dict[str, int]] = None,
+) -> RoundResult:
+    """
+    Same result as compute_round_result, computed with numpy for large rounds
+    Words are interned to integer ids and the guesses are stored in a dense
+    players x N_GUESSES array (padded with -1), so that word counts and player
+    scores are computed with bincount and gather operations
+    word_counts is accepted for compatibility but not needed here
+    """
+    import numpy as np
+
+    player_names = list(guesses_by_player.keys())
+    n_guesses_by_player = np.fromiter(
+        (len(guess_list.words) for guess_list in guesses_by_player.values()),
+        dtype=np.int64,
+        count=len(player_names),
+    )
+    all_words = [
+        word for guess_list in guesses_by_player.values() for word in guess_list.words
+    ]
+    if len(all_words) == 0:
+        return RoundResult(
+            value_by_word={},
+            score_by_player_name={player_name: 0 for player_name in player_names},
+        )
+
+    # Intern the words: vocabulary[word_ids[i]] == all_words[i]
+    # (dict lookups are much cheaper than sorting a numpy string array)
+    vocabulary = list(dict.fromkeys(all_words))
+    word_id_by_word = dict(zip(vocabulary, range(len(vocabulary))))
+    word_ids = np.fromiter(
+        map(word_id_by_word.__getitem__, all_words),
+        dtype=np.int64,
+        count=len(all_words),
+    )
+
+    # Position of each guess within its player's row
+    row_starts = np.cumsum(n_guesses_by_player) - n_guesses_by_player
+    rows = np.repeat(np.arange(len(player_names)), n_guesses_by_player)
+    columns = np.arange(len(all_words)) - np.repeat(row_starts, n_guesses_by_player)
+    guesses = np.full((len(player_names), N_GUESSES), -1, dtype=np.int32)
+    guesses[rows, columns] = word_ids
+
+    word_values = np.bincount(word_ids, minlength=len(vocabulary)) - 1
+    # Append a zero value at index -1 for the padding
+    padded_word_values = np.append(word_values, 0)
+    scores = padded_word_values[guesses].sum(axis=1)
+
+    return RoundResult(
+        value_by_word=dict(zip(vocabulary, word_values.tolist())),
+        score_by_player_name=dict(zip(player_names, scores.tolist())),
+    )
@@ -0,0 +1,63 @@
+from typing import Union, Tuple
+
+from src.domain.entities import PlayerName, RoundResult
+
+
+class Leaderboard:
+    """
+    Players sorted once by score
+    Players with the same score share the same rank (1, 2, 2, 4...)
+    """
+
+    def __init__(self, score_by_player_name: dict[PlayerName, int]):
+        self.ranked_score_by_player_name: list[Tuple[PlayerName, int]] = sorted(
+            score_by_player_name.items(), key=lambda item: item[1], reverse=True
+        )
+        self.ranks: list[int] = []
+        self.index_by_player_name: dict[PlayerName, int] = {}
+        for index, (player_name, score) in enumerate(self.ranked_score_by_player_name):
+            if index > 0 and score == self.ranked_score_by_player_name[index - 1][1]:
+                self.ranks.append(self.ranks[-1])
+            else:
+                self.ranks.append(index + 1)
+            self.index_by_player_name[player_name] = index
+
+    @property
+    def n_players(self) -> int:
+        return len(self.ranked_score_by_player_name)
+
+    def get_player_score_and_rank(
+        self, player_name: PlayerName
+    ) -> Union[Tuple[int, int], None]:
+        if player_name not in self.index_by_player_name:
+            return None
+        index = self.index_by_player_name[player_name]
+        return self.ranked_score_by_player_name[index][1], self.ranks[index]
+
+    def get_page(self, offset: int, limit: int) -> list[Tuple[int, PlayerName, int]]:
+        """
+        (rank, player name, score) of the players in the requested range
+        """
+        return [
+            (self.ranks[index], player_name, score)
+            for index, (player_name, score) in enumerate(
+                self.ranked_score_by_player_name[offset : offset + limit],
+                start=offset,
+            )
+        ]
+
+
+class RoundStandings(Leaderboard):
+    """
+    Words and players of a completed round, sorted once by value and score
+    Words are given with the spelling of the players
+    """
+
+    def __init__(self, result: RoundResult):
+        super().__init__(result.score_by_player_name)
+        self.ranked_value_by_word: list[Tuple[str, int]] = [
+            (result.display_word(word), value)
+            for word, value in sorted(
+                result.value_by_word.items(), key=lambda item: item[1], reverse=True
+            )
+        ]
@@ -0,0 +1,323 @@
+import asyncio
+import itertools
+import json
+import time
+from typing import NamedTuple, Union
+
+from starlette.websockets import WebSocket
+
+from src.broker import WorkerId
+from src.connectivity import BroadcastReport, WebsocketConnectionPool
+from src.domain.entities import GameError, PlayerName
+from src.messages import JSON_PROTOCOL, EncodedMessage
+from src.rooms import RoomManager
+
+# Frames published by the game process:
+# - {"kind": "broadcast", "room", "type", "text"}: to all the clients of a room
+# - {"kind": "send", "messages": [[connection_id, type, text], ...]}: to some clients
+# - {"kind": "close", "connection_id", "reason"}: the client is disconnected
+# Frames sent by the workers:
+# - {"kind": "connect", "connection_id", "room", "player_name", "session_id",
+#   "state_tag"}: the last two are null unless the client resumes a session
+# - {"kind": "disconnect", "connection_id"}
+# - {"kind": "guesses", "connection_id", "words"}
+
+
+class RemoteConnection(NamedTuple):
+    """
+    A client connected to one of the websocket workers
+    """
+
+    worker_id: WorkerId
+    connection_id: int
+
+
+class RemoteConnectionPool(WebsocketConnectionPool):
+    """
+    Connection pool of a room in the game process, when the websockets are
+    served by worker processes
+    A broadcast is published once to the workers, which send it to their clients
+    """
+
+    def __init__(self, room: str, hub):
+        super().__init__()
+        self.room = room
+        self.hub = hub
+
+    async def connect(
+        self,
+        websocket: RemoteConnection,
+        player_name: PlayerName,
+        protocol: str = JSON_PROTOCOL,
+        subprotocol: Union[str, None] = None,
+        session_id: Union[str, None] = None,
+    ) -> bool:
+        # The wire protocol only matters to the worker holding the websocket
+        return self.register(websocket, player_name, session_id)
+
+    def _close(self, websocket: RemoteConnection, reason: Union[str, None] = None):
+        self.hub.publish(
+            {
+                "kind": "close",
+                "connection_id": websocket.connection_id,
+                "reason": reason or "",
+            },
+            worker_id=websocket.worker_id,
+        )
+
+    def send_many(
+        self, messages: list[tuple[RemoteConnection, EncodedMessage]]
+    ) -> BroadcastReport:
+        start = time.perf_counter()
+        items_by_worker_id: dict[WorkerId, list] = {}
+        for connection, message in messages:
+            items_by_worker_id.setdefault(connection.worker_id, []).append(
+                [connection.connection_id, message.type, message.text]
+            )
+        for worker_id, items in items_by_worker_id.items():
+            self.hub.publish({"kind": "send", "messages": items}, worker_id=worker_id)
+        return BroadcastReport(
+            n_connections=len(messages),
+            n_failed=0,
+            duration_seconds=time.perf_counter() - start,
+        )
+
+    def broadcast(self, message: Union[dict, EncodedMessage]) -> BroadcastReport:
+        start = time.perf_counter()
+        if isinstance(message, dict):
+            message = EncodedMessage(message)
+        self.hub.publish(
+            {
+                "kind": "broadcast",
+                "room": self.room,
+                "type": message.type,
+                "text": message.text,
+            }
+        )
+        return BroadcastReport(
+            n_connections=len(self.active_connections),
+            n_failed=0,
+            duration_seconds=time.perf_counter() - start,
+        )
+
+
+class GameHost:
+    """
+    Game process side of the multi-worker mode: runs the game of every room
+    and handles the frames of the websocket workers
+    """
+
+    def __init__(self, hub, room_manager: RoomManager):
+        self.hub = hub
+        self.room_manager = room_manager
+        self.room_by_connection: dict[RemoteConnection, str] = {}
+
+    async def start(self):
+        await self.hub.start(self.handle_frame)
+
+    def handle_frame(self, worker_id: WorkerId, frame: dict):
+        if frame["kind"] == "worker_lost":
+            for connection in list(self.room_by_connection):
+                if connection.worker_id == worker_id:
+                    self._disconnect(connection)
+            return
+
+        connection = RemoteConnection(worker_id, frame["connection_id"])
+        if frame["kind"] == "connect":
+            self._connect(
+                connection,
+                frame["room"],
+                frame["player_name"],
+                frame.get("session_id"),
+                frame.get("state_tag"),
+            )
+        elif frame["kind"] == "disconnect":
+            self._disconnect(connection)
+        elif frame["kind"] == "guesses":
+            self._set_guesses(connection, frame["words"])
+
+    def _connect(
+        self,
+        connection: RemoteConnection,
+        room: str,
+        player_name: str,
+        session_id: Union[str, None],
+        state_tag: Union[str, None],
+    ):
+        try:
+            runner = self.room_manager.get_or_create(room)
+        except GameError as e:
+            self.hub.publish(
+                {
+                    "kind": "close",
+                    "connection_id": connection.connection_id,
+                    "reason": str(e),
+                },
+                worker_id=connection.worker_id,
+            )
+            return
+        self.room_by_connection[connection] = room
+        resumed = runner.websocket_connection_pool.register(
+            connection, player_name, session_id
+        )
+        if not resumed or state_tag != runner.state_tag:
+            runner.personal_send_game_state(websocket=connection)
+
+    def _disconnect(self, connection: RemoteConnection):
+        room = self.room_by_connection.pop(connection, None)
+        runner = self.room_manager.runner_by_room.get(room)
+        if runner is not None:
+            runner.websocket_connection_pool.disconnect(connection)
+
+    def _set_guesses(self, connection: RemoteConnection, words: list[str]):
+        runner = self.room_manager.runner_by_room.get(
+            self.room_by_connection.get(connection)
+        )
+        if runner is None:
+            return
+        player_name = runner.websocket_connection_pool.player_name_by_websocket.get(
+            connection
+        )
+        if player_name is None:
+            return
+        # Rate limits are applied by the workers
+        runner.submit_guesses(
+            player_name=player_name,
+            guesses=words,
+            websocket=connection,
+        )
+
+
+class WorkerRelay:
+    """
+    Worker process side of the multi-worker mode: serves the websockets of its
+    own clients, forwards their guesses to the game process and sends them
+    the messages it publishes
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.pool_by_room: dict[str, WebsocketConnectionPool] = {}
+        # The pool of a room is kept while connection ids refer to it, even
+        # once its connections have been evicted
+        self.n_connections_by_room: dict[str, int] = {}
+        self.websocket_by_connection_id: dict[int, WebSocket] = {}
+        self.room_and_player_name_by_connection_id: dict[
+            int, tuple[str, PlayerName]
+        ] = {}
+        # Sessions are issued by the game process, they are tracked here to
+        # resume them when registering the connections again
+        self.session_id_by_connection_id: dict[int, str] = {}
+        self._connection_ids = itertools.count()
+
+    async def start(self):
+        await self.client.connect(self.handle_frame, on_connected=self._register_all)
+
+    def _register_all(self):
+        # After a (re)connection, the game process does not know our clients
+        connections = self.room_and_player_name_by_connection_id.items()
+        for connection_id, (room, player_name) in connections:
+            self._send_connect(connection_id, room, player_name)
+
+    def _send_connect(
+        self,
+        connection_id: int,
+        room: str,
+        player_name: PlayerName,
+        state_tag: Union[str, None] = None,
+    ):
+        self.client.send(
+            {
+                "kind": "connect",
+                "connection_id": connection_id,
+                "room": room,
+                "player_name": player_name,
+                "session_id": self.session_id_by_connection_id.get(connection_id),
+                "state_tag": state_tag,
+            }
+        )
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room: str,
+        player_name: PlayerName,
+        protocol: str = JSON_PROTOCOL,
+        subprotocol: Union[str, None] = None,
+        session_id: Union[str, None] = None,
+        state_tag: Union[str, None] = None,
+    ) -> int:
+        if room not in self.pool_by_room:
+            self.pool_by_room[room] = WebsocketConnectionPool(report_presence=False)
+        await self.pool_by_room[room].connect(
+            websocket, player_name, protocol=protocol, subprotocol=subprotocol
+        )
+        connection_id = next(self._connection_ids)
+        self.n_connections_by_room[room] = self.n_connections_by_room.get(room, 0) + 1
+        self.websocket_by_connection_id[connection_id] = websocket
+        self.room_and_player_name_by_connection_id[connection_id] = (
+            room,
+            player_name,
+        )
+        if session_id is not None:
+            self.session_id_by_connection_id[connection_id] = session_id
+        self._send_connect(connection_id, room, player_name, state_tag)
+        return connection_id
+
+    def disconnect(self, connection_id: int):
+        websocket = self.websocket_by_connection_id.pop(connection_id, None)
+        if websocket is None:
+            return
+        room, _ = self.room_and_player_name_by_connection_id.pop(connection_id)
+        self.session_id_by_connection_id.pop(connection_id, None)
+        self.pool_by_room[room].disconnect(websocket)
+        self.n_connections_by_room[room] -= 1
+        if self.n_connections_by_room[room] == 0:
+            del self.n_connections_by_room[room]
+            del self.pool_by_room[room]
+        self.client.send({"kind": "disconnect", "connection_id": connection_id})
+
+    def submit_guesses(self, connection_id: int, words: list[str]):
+        websocket = self.websocket_by_connection_id.get(connection_id)
+        if websocket is None:
+            return
+        room, _ = self.room_and_player_name_by_connection_id[connection_id]
+        if not self.pool_by_room[room].allow_guesses(websocket):
+            return
+        self.client.send(
+            {"kind": "guesses", "connection_id": connection_id, "words": words}
+        )
+
+    def send_error(self, connection_id: int, message: str):
+        websocket = self.websocket_by_connection_id.get(connection_id)
+        if websocket is None:
+            return
+        room, _ = self.room_and_player_name_by_connection_id[connection_id]
+        self.pool_by_room[room].send_personal_message(
+            {"type": "error", "data": {"message": message}}, websocket
+        )
+
+    def handle_frame(self, frame: dict):
+        if frame["kind"] == "broadcast":
+            pool = self.pool_by_room.get(frame["room"])
+            if pool is not None:
+                pool.broadcast(EncodedMessage.from_text(frame["type"], frame["text"]))
+        elif frame["kind"] == "send":
+            for connection_id, message_type, text in frame["messages"]:
+                if connection_id not in self.websocket_by_connection_id:
+                    continue
+                if message_type == "session":
+                    self.session_id_by_connection_id[connection_id] = json.loads(text)[
+                        "data"
+                    ]["session_id"]
+                room, _ = self.room_and_player_name_by_connection_id[connection_id]
+                self.pool_by_room[room].send_personal_message(
+                    EncodedMessage.from_text(message_type, text),
+                    self.websocket_by_connection_id[connection_id],
+                )
+        elif frame["kind"] == "close":
+            websocket = self.websocket_by_connection_id.get(frame["connection_id"])
+            if websocket is not None:
+                asyncio.ensure_future(
+                    websocket.close(code=1008, reason=frame["reason"])
+                )
@@ -1,60 +1,178 @@
 import asyncio
 import datetime as dt
+import time
+from typing import Union
 
 from starlette.websockets import WebSocket
 
+from src.clock import WALL_CLOCK, Clock
 from src.state_store import StateStore
 from src.connectivity import WebsocketConnectionPool
+from src.messages import EncodedMessage
+from src.scheduler import Scheduler
+from src.domain.canonical import DEFAULT_CANONICALIZER, Canonicalizer
 from src.domain.constants import INTER_ROUND_DURATION_SECONDS, ROUND_DURATION_SECONDS
-from src.domain.entities import PlayerName, GuessList
+from src import metrics
+from src.domain.aggregates import GameAggregates
+from src.domain.entities import PlayerName, GuessList, RoundResult, GameError
 from src.domain.game import Game
+from src.domain.standings import RoundStandings
+from src.log import get_logger
+
+logger = get_logger("game_runner")
 
 
 class GameRunner:
     """
-    Runs the game loop that starts and completes rounds, and broadcasts game state
+    Runs the game of one room: starts and completes rounds when its timer fires
+    on the shared scheduler, and broadcasts game state
     """
 
-    def __init__(self, connection_pool: WebsocketConnectionPool):
-        self.game = Game(state=StateStore())
+    # Number of words and players included in the shared result message
+    leaderboard_size = 20
+    # Guess submissions are buffered and applied at this interval, keeping
+    # only the latest submission of each player
+    guess_ingestion_interval_seconds = 0.1
+    # The progress of the ongoing round (submissions, distinct words and most
+    # guessed words) is broadcast at most once per interval, None to disable
+    progress_interval_seconds: Union[float, None] = None
+    progress_size = 5
+    # Only the counts of the most guessed words are sent, not the words
+    hide_progress_words = False
+
+    def __init__(
+        self,
+        connection_pool: WebsocketConnectionPool,
+        scheduler: Scheduler,
+        room: str = "public",
+        scoring_engine: str = "python",
+        state_store: Union[StateStore, None] = None,
+        clock: Clock = WALL_CLOCK,
+        progress_interval_seconds: Union[float, None] = None,
+        hide_progress_words: Union[bool, None] = None,
+        canonicalizer: Union[Canonicalizer, None] = DEFAULT_CANONICALIZER,
+    ):
+        self.clock = clock
+        if progress_interval_seconds is not None:
+            self.progress_interval_seconds = progress_interval_seconds
+        if hide_progress_words is not None:
+            self.hide_progress_words = hide_progress_words
+        self.game = Game(
+            state=state_store if state_store is not None else StateStore(),
+            scoring_engine=scoring_engine,
+            aggregates=GameAggregates(),
+            clock=clock,
+            canonicalizer=canonicalizer,
+        )
         self.websocket_connection_pool = connection_pool
+        self.scheduler = scheduler
+        self.room = room
 
-        self.next_switch = dt.datetime.now(dt.timezone.utc)
+        # Set when the game state or next switch changes, then replaced for
+        # the next change
+        self._state_changed = asyncio.Event()
+        self.next_switch = self.clock.now()
+        # How late the last round transition happened compared to next_switch
+        self.loop_lag_seconds = 0.0
 
-    async def run_game_loop_forever(self):
-        while True:
-            try:
-                await self.run_game_loop()
-            except Exception as e:
-                print("Loop failed with exception: ", repr(e))
-
-    async def run_game_loop(self):
-        print("Initializing game loop")
-        while True:
-            await asyncio.sleep(0.1)
-            if dt.datetime.now(dt.timezone.utc) <= self.next_switch:
-                continue
-
-            if self.game.has_ongoing_round:
-                # A round is ongoing and has ended
-                print(
-                    f"Completed round for word {self.game.get_game_state()[0].theme_word}"
-                )
-                self.game.complete_current_round()
-                self.next_switch = dt.datetime.now(dt.timezone.utc) + dt.timedelta(
-                    seconds=INTER_ROUND_DURATION_SECONDS
-                )
-            else:
-                # Time to start a new round
-                self.game.start_new_round()
-                print(
-                    f"Started round for word {self.game.get_game_state()[0].theme_word}"
-                )
-                self.next_switch = dt.datetime.now(dt.timezone.utc) + dt.timedelta(
-                    seconds=ROUND_DURATION_SECONDS
-                )
+        self._game_state_message_cache: Union[EncodedMessage, None] = None
+        self._game_state_message_cache_key = None
+        self._standings: Union[RoundStandings, None] = None
+        self._standings_result: Union[RoundResult, None] = None
+        # Round of the standings, as the ETag of the /standings pages
+        self.standings_tag: Union[str, None] = None
+
+        # Latest guess submission of each player since the last ingestion,
+        # with the connection to report errors to
+        self._pending_guesses: dict[PlayerName, tuple[GuessList, WebSocket]] = {}
+        self._ingestion_timer_key = (self, "ingestion")
+        self._progress_timer_key = (self, "progress")
+        self._last_progress_at = dt.datetime.min.replace(tzinfo=dt.timezone.utc)
 
-            await self.broadcast_game_state()
+        # Clients following the game state over HTTP rather than a websocket
+        self.n_event_streams = 0
+
+    @property
+    def next_switch(self) -> dt.datetime:
+        return self._next_switch
+
+    @next_switch.setter
+    def next_switch(self, value: dt.datetime):
+        # Moving next_switch reschedules the timer of this room
+        self._next_switch = value
+        self.scheduler.schedule(self, value, self.switch)
+        # The state tag includes the next switch
+        self._notify_state_changed()
+
+    def _notify_state_changed(self):
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+
+    def stop(self):
+        self.scheduler.cancel(self)
+        self.scheduler.cancel(self._ingestion_timer_key)
+        self.scheduler.cancel(self._progress_timer_key)
+
+    def start(self):
+        """
+        Start the first round right away, so that the game state is available
+        as soon as the first player connects
+        """
+        if self.game.get_game_state()[0] is None:
+            self.advance()
+
+    def advance(self):
+        """
+        Complete the ongoing round or start a new one, and set the next switch
+        """
+        # Submissions received before the switch are applied to the round they target
+        self.apply_pending_guesses()
+        if self.game.has_ongoing_round:
+            # A round is ongoing and has ended
+            logger.info(
+                "Completed round",
+                extra={
+                    "event": "round_completed",
+                    "room": self.room,
+                    "theme_word": self.game.get_game_state()[0].theme_word,
+                },
+            )
+            self.scheduler.cancel(self._progress_timer_key)
+            start = time.perf_counter()
+            self.game.complete_current_round()
+            metrics.round_result_duration_seconds.observe(time.perf_counter() - start)
+            self.next_switch = self.clock.now() + dt.timedelta(
+                seconds=INTER_ROUND_DURATION_SECONDS
+            )
+        else:
+            # Time to start a new round
+            self.game.start_new_round()
+            logger.info(
+                "Started round",
+                extra={
+                    "event": "round_started",
+                    "room": self.room,
+                    "theme_word": self.game.get_game_state()[0].theme_word,
+                },
+            )
+            self.next_switch = self.clock.now() + dt.timedelta(
+                seconds=ROUND_DURATION_SECONDS
+            )
+
+    async def switch(self):
+        """
+        Called by the scheduler when next_switch is reached
+        """
+        self.loop_lag_seconds = (self.clock.now() - self.next_switch).total_seconds()
+        metrics.game_loop_lag_seconds.observe(self.loop_lag_seconds)
+        try:
+            self.advance()
+        except Exception:
+            logger.exception("Round switch failed", extra={"room": self.room})
+            # Retry shortly rather than leaving the room without a timer
+            self.next_switch = self.clock.now() + dt.timedelta(seconds=1)
+            return
+        self.broadcast_game_state()
 
     @property
     def game_state_message(self) -> dict:
@@ -73,41 +191,267 @@ class GameRunner:
                         "is_completed": False,
                     },
                     "round_end": self.next_switch.isoformat(),
+                    "state_tag": self.state_tag,
                 },
             }
+        standings = self.standings
         return {
             "type": "game_state",
             "data": {
                 "round": {"theme_word": latest_round.theme_word, "is_completed": True},
                 "next_round_start": self.next_switch.isoformat(),
+                "state_tag": self.state_tag,
                 "result": {
                     "ranked_value_by_word": [
-                        {"word": item[0], "value": item[1]}
-                        for item in sorted(
-                            result.value_by_word.items(),
-                            key=lambda item: item[1],
-                            reverse=True,
-                        )
+                        {"word": word, "value": value}
+                        for word, value in standings.ranked_value_by_word[
+                            : self.leaderboard_size
+                        ]
                     ],
                     "ranked_score_by_player_name": [
-                        {"player_name": item[0], "score": item[1]}
-                        for item in sorted(
-                            result.score_by_player_name.items(),
-                            key=lambda item: item[1],
-                            reverse=True,
-                        )
+                        {"player_name": player_name, "score": score}
+                        for player_name, score in standings.ranked_score_by_player_name[
+                            : self.leaderboard_size
+                        ]
                     ],
+                    "n_players": standings.n_players,
                 },
             },
         }
 
-    async def broadcast_game_state(self):
-        await self.websocket_connection_pool.broadcast(self.game_state_message)
+    @property
+    def state_tag(self) -> str:
+        """
+        Identifies the game state sent to the clients, so that a client
+        resuming its session with the same tag does not need it again
+        """
+        latest_round, result = self.game.get_game_state()
+        return "-".join(
+            [
+                latest_round.round_id.hex,
+                "completed" if result is not None else "ongoing",
+                str(int(self.next_switch.timestamp())),
+            ]
+        )
+
+    @property
+    def standings(self) -> Union[RoundStandings, None]:
+        """
+        Standings of the latest completed round, sorted once per round
+        They are kept during the following round to serve the full standings
+        """
+        latest_round, result = self.game.get_game_state()
+        if result is not None and result is not self._standings_result:
+            self._standings = RoundStandings(result)
+            self._standings_result = result
+            self.standings_tag = latest_round.round_id.hex
+        return self._standings
+
+    def personal_result_message(
+        self, player_name: PlayerName
+    ) -> Union[EncodedMessage, None]:
+        """
+        Score and rank of the player, sent in addition to the shared game state
+        which only contains the top of the leaderboard
+        """
+        _, result = self.game.get_game_state()
+        if result is None:
+            return None
+        score_and_rank = self.standings.get_player_score_and_rank(player_name)
+        if score_and_rank is None:
+            return None
+        score, rank = score_and_rank
+        return EncodedMessage(
+            {
+                "type": "personal_result",
+                "data": {
+                    "score": score,
+                    "rank": rank,
+                    "n_players": self.standings.n_players,
+                },
+            }
+        )
+
+    @property
+    def encoded_game_state_message(self) -> EncodedMessage:
+        """
+        The game state message is built and encoded once per state transition
+        and shared by all the sends until the game state or next switch changes
+        """
+        cache_key = (self.game.state_version, self.next_switch)
+        if self._game_state_message_cache_key != cache_key:
+            self._game_state_message_cache = EncodedMessage(self.game_state_message)
+            self._game_state_message_cache_key = cache_key
+        return self._game_state_message_cache
+
+    async def wait_for_state_change(self, state_tag: str, timeout: float):
+        """
+        Return once the game state differs from the given tag, or at the timeout
+        """
+        state_changed = self._state_changed
+        if state_tag != self.state_tag:
+            return
+        try:
+            await asyncio.wait_for(state_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def broadcast_game_state(self):
+        self._notify_state_changed()
+        report = self.websocket_connection_pool.broadcast(
+            self.encoded_game_state_message
+        )
+        metrics.broadcast_duration_seconds.observe(report.duration_seconds)
+        logger.info(
+            "Broadcast game state",
+            extra={
+                "event": "game_state_broadcast",
+                "room": self.room,
+                "n_connections": report.n_connections,
+                "n_evicted": report.n_failed,
+                "duration_ms": report.duration_seconds * 1000,
+            },
+        )
+        self.send_personal_results()
+
+    def send_personal_results(self):
+        personal_messages = []
+        player_name_by_websocket = (
+            self.websocket_connection_pool.player_name_by_websocket
+        )
+        for websocket, player_name in list(player_name_by_websocket.items()):
+            message = self.personal_result_message(player_name)
+            if message is not None:
+                personal_messages.append((websocket, message))
+        if len(personal_messages) > 0:
+            self.websocket_connection_pool.send_many(personal_messages)
+
+    def personal_send_game_state(self, websocket: WebSocket):
+        self.websocket_connection_pool.send_personal_message(
+            self.encoded_game_state_message, websocket
+        )
+        player_name = self.websocket_connection_pool.player_name_by_websocket.get(
+            websocket
+        )
+        personal_result_message = self.personal_result_message(player_name)
+        if personal_result_message is not None:
+            self.websocket_connection_pool.send_personal_message(
+                personal_result_message, websocket
+            )
 
-    async def personal_send_game_state(self, websocket: WebSocket):
-        await self.websocket_connection_pool.send_personal_message(
-            self.game_state_message, websocket
+    def submit_guesses(
+        self, player_name: PlayerName, guesses: list[str], websocket: WebSocket
+    ):
+        """
+        Buffer the guesses until the next ingestion, replacing any pending
+        submission of the player
+        Invalid guess lists are reported right away and do not replace the
+        pending submission
+        """
+        metrics.guesses_received_total.inc()
+        try:
+            guess_list = GuessList(guesses)
+        except GameError as e:
+            metrics.game_errors_total.inc()
+            self.websocket_connection_pool.send_many(
+                [
+                    (
+                        websocket,
+                        EncodedMessage({"type": "error", "data": {"message": str(e)}}),
+                    )
+                ]
+            )
+            return
+        if len(self._pending_guesses) == 0:
+            self.scheduler.schedule(
+                self._ingestion_timer_key,
+                self.clock.now()
+                + dt.timedelta(seconds=self.guess_ingestion_interval_seconds),
+                self._ingest,
+            )
+        self._pending_guesses[player_name] = (guess_list, websocket)
+
+    async def _ingest(self):
+        self.apply_pending_guesses()
+
+    def apply_pending_guesses(self):
+        """
+        Apply the buffered submissions, invalid ones are reported to their
+        connection with an error message
+        """
+        if len(self._pending_guesses) == 0:
+            return
+        pending_guesses = self._pending_guesses
+        self._pending_guesses = {}
+        self.scheduler.cancel(self._ingestion_timer_key)
+        error_messages = []
+        for player_name, (guess_list, websocket) in pending_guesses.items():
+            try:
+                self.set_guesses(player_name, guess_list)
+            except GameError as e:
+                error_messages.append(
+                    (
+                        websocket,
+                        EncodedMessage({"type": "error", "data": {"message": str(e)}}),
+                    )
+                )
+        if len(error_messages) > 0:
+            self.websocket_connection_pool.send_many(error_messages)
+        if len(error_messages) < len(pending_guesses):
+            self._schedule_progress()
+
+    def _schedule_progress(self):
+        """
+        Schedule a progress broadcast, unless one is already due: guesses
+        applied in between are included in that broadcast
+        """
+        if (
+            self.progress_interval_seconds is None
+            or self._progress_timer_key in self.scheduler
+        ):
+            return
+        self.scheduler.schedule(
+            self._progress_timer_key,
+            max(
+                self.clock.now(),
+                self._last_progress_at
+                + dt.timedelta(seconds=self.progress_interval_seconds),
+            ),
+            self._broadcast_progress,
+        )
+
+    async def _broadcast_progress(self):
+        self._last_progress_at = self.clock.now()
+        message = self.round_progress_message
+        if message is not None:
+            self.websocket_connection_pool.broadcast(message)
+
+    @property
+    def round_progress_message(self) -> Union[EncodedMessage, None]:
+        progress = self.game.get_round_progress(self.progress_size)
+        if progress is None:
+            return None
+        return EncodedMessage(
+            {
+                "type": "round_progress",
+                "data": {
+                    "n_submissions": progress.n_submissions,
+                    "n_distinct_words": progress.n_distinct_words,
+                    "top_words": [
+                        (
+                            {"count": count}
+                            if self.hide_progress_words
+                            else {"word": word, "count": count}
+                        )
+                        for word, count in progress.top_word_counts
+                    ],
+                },
+            }
         )
 
-    def set_guesses(self, player_name: PlayerName, guesses: list[str]):
-        self.game.set_guesses(player_name=player_name, guess_list=GuessList(guesses))
+    def set_guesses(self, player_name: PlayerName, guess_list: GuessList):
+        try:
+            self.game.set_guesses(player_name=player_name, guess_list=guess_list)
+        except GameError:
+            metrics.game_errors_total.inc()
+            raise
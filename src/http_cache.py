@@ -0,0 +1,56 @@
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+class ResponseCache:
+    """
+    JSON responses encoded once per version of the data they are built from
+    They carry the version as ETag, so that clients polling with
+    If-None-Match get an empty 304 until the data changes
+    """
+
+    max_entries = 1024
+
+    def __init__(self):
+        self._etag_and_body_by_key: OrderedDict[Hashable, tuple[str, bytes]] = (
+            OrderedDict()
+        )
+
+    def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        version: str,
+        build: Callable[[], Any],
+    ) -> Response:
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        cached = self._etag_and_body_by_key.get(key)
+        if cached is not None and cached[0] == etag:
+            self._etag_and_body_by_key.move_to_end(key)
+            body = cached[1]
+        else:
+            body = json.dumps(build(), separators=(",", ":"), ensure_ascii=False)
+            body = body.encode()
+            self._etag_and_body_by_key[key] = (etag, body)
+            self._etag_and_body_by_key.move_to_end(key)
+            if len(self._etag_and_body_by_key) > self.max_entries:
+                self._etag_and_body_by_key.popitem(last=False)
+        return Response(content=body, media_type="application/json", headers=headers)
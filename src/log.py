@@ -0,0 +1,127 @@
+import copy
+import datetime as dt
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Union
+
+# Records are queued by the event loop and written to stdout by a background
+# thread, as JSON lines so that they stay parseable in the fly.io logs
+# High volume events (passed as extra={"event": ...}) are rate limited
+
+# Attributes of every LogRecord, anything else was passed as an extra field
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Union[logging.handlers.QueueListener, None] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": dt.datetime.fromtimestamp(
+                record.created, dt.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class JsonQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues a copy of the record without the traceback object, which cannot
+    cross threads, but with the formatted traceback in its exception field
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exception = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most max_per_interval records of each event through per interval
+    The first record of the next interval reports how many were suppressed
+    Records without an event are never limited
+    """
+
+    def __init__(self, max_per_interval: int = 20, interval_seconds: float = 1.0):
+        super().__init__()
+        self.max_per_interval = max_per_interval
+        self.interval_seconds = interval_seconds
+        # event -> [interval start, records let through, records suppressed]
+        self._state_by_event: dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+
+        now = time.monotonic()
+        state = self._state_by_event.get(event)
+        if state is None or now - state[0] >= self.interval_seconds:
+            if state is not None and state[2] > 0:
+                record.suppressed = state[2]
+            self._state_by_event[event] = [now, 1, 0]
+            return True
+        if state[1] < self.max_per_interval:
+            state[1] += 1
+            return True
+        state[2] += 1
+        return False
+
+
+def configure_logging(level: str = os.environ.get("LOG_LEVEL", "INFO")) -> None:
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = JsonQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+    logger = logging.getLogger("consensus")
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+
+def stop_logging() -> None:
+    """
+    Write the remaining records before exiting
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logger = logging.getLogger("consensus")
+        for handler in list(logger.handlers):
+            if isinstance(handler, JsonQueueHandler):
+                logger.removeHandler(handler)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"consensus.{name}")
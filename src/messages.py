@@ -0,0 +1,102 @@
+import json
+from functools import cached_property
+from typing import Any, Union
+
+# Wire protocols, chosen per connection with ?protocol=... or the websocket
+# subprotocol. JSON text frames are the default, msgpack uses binary frames
+# where lists of objects are sent as columns (see to_columnar)
+JSON_PROTOCOL = "json"
+MSGPACK_PROTOCOL = "msgpack"
+MSGPACK_SUBPROTOCOL = "consensus.msgpack"
+
+
+def negotiate_protocol(
+    protocol_query_param: Union[str, None], subprotocols: list[str]
+) -> tuple[str, Union[str, None]]:
+    """
+    Returns the protocol of the connection, and the subprotocol to accept if any
+    """
+    if MSGPACK_SUBPROTOCOL in subprotocols:
+        return MSGPACK_PROTOCOL, MSGPACK_SUBPROTOCOL
+    if protocol_query_param == MSGPACK_PROTOCOL:
+        return MSGPACK_PROTOCOL, None
+    return JSON_PROTOCOL, None
+
+
+# Lists of objects sent as columns with msgpack, with their columns, so that
+# the shape of a message does not depend on its content
+COLUMNS_BY_FIELD: dict[str, tuple[str, ...]] = {
+    "ranked_value_by_word": ("word", "value"),
+    "ranked_score_by_player_name": ("player_name", "score"),
+    "top_words": ("word", "count"),
+}
+
+
+def to_columnar(value: Any) -> Any:
+    """
+    Turn the lists of objects of COLUMNS_BY_FIELD into objects of lists, so
+    that the keys are not repeated for every item, e.g. the entries of the
+    round result: [{"word": "a", "value": 1}, {"word": "b", "value": 0}]
+    becomes {"word": ["a", "b"], "value": [1, 0]}
+    An empty list gives empty columns, and missing fields are sent as nulls
+    """
+    if isinstance(value, dict):
+        return {
+            key: (
+                {
+                    column: [to_columnar(row.get(column)) for row in item]
+                    for column in COLUMNS_BY_FIELD[key]
+                }
+                if key in COLUMNS_BY_FIELD and isinstance(item, list)
+                else to_columnar(item)
+            )
+            for key, item in value.items()
+        }
+    return value
+
+
+class EncodedMessage:
+    """
+    A server message encoded once, then sent as-is to any number of connections
+    """
+
+    def __init__(self, message: dict):
+        self.type: str = message["type"]
+        self._message = message
+        # Same encoding as starlette's send_json
+        self.text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+    @classmethod
+    def from_text(cls, message_type: str, text: str) -> "EncodedMessage":
+        """
+        Wrap a message that was already encoded, e.g. by another process
+        """
+        message = cls.__new__(cls)
+        message.type = message_type
+        message._message = None
+        message.text = text
+        return message
+
+    @cached_property
+    def binary(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    @cached_property
+    def event_stream(self) -> bytes:
+        """
+        As a server-sent event, the JSON text never contains line breaks
+        """
+        return f"event: {self.type}\ndata: {self.text}\n\n".encode("utf-8")
+
+    @cached_property
+    def msgpack(self) -> bytes:
+        """
+        Only encoded if a connection uses the msgpack protocol
+        """
+        import msgpack
+
+        message = self._message if self._message is not None else json.loads(self.text)
+        return msgpack.packb(to_columnar(message))
+
+    def __repr__(self):
+        return f"EncodedMessage({self.text})"
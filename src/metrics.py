@@ -0,0 +1,151 @@
+import bisect
+from typing import Callable, Union
+
+# Cheap in-process metrics, rendered in the Prometheus text format by /metrics
+# Metrics are only updated from the event loop thread, so no locking is needed
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge:
+    """
+    Either set explicitly, or computed by a function when rendered
+    """
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value: float = 0
+        self.function: Union[Callable[[], float], None] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def render(self) -> list[str]:
+        value = self.function() if self.function is not None else self.value
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        # Non cumulative counts, the last one is for the +Inf bucket
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative_count = 0
+        for bound, bucket_count in zip(
+            [*map(str, self.buckets), "+Inf"], self.bucket_counts
+        ):
+            cumulative_count += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative_count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+broadcast_duration_seconds = Histogram(
+    "consensus_broadcast_duration_seconds",
+    "Time to send a game state broadcast to all the connections of a room",
+)
+round_result_duration_seconds = Histogram(
+    "consensus_round_result_duration_seconds",
+    "Time to compute the result of a round",
+)
+game_loop_lag_seconds = Histogram(
+    "consensus_game_loop_lag_seconds",
+    "Delay between the scheduled and actual time of round transitions",
+)
+active_connections = Gauge(
+    "consensus_active_connections", "Number of connected websockets"
+)
+active_event_streams = Gauge(
+    "consensus_active_event_streams", "Number of clients following /events"
+)
+guesses_received_total = Counter(
+    "consensus_guesses_received_total", "Number of guess submissions received"
+)
+game_errors_total = Counter(
+    "consensus_game_errors_total", "Number of guess submissions rejected"
+)
+rate_limited_guesses_total = Counter(
+    "consensus_rate_limited_guesses_total",
+    "Number of guess submissions dropped by the per-connection rate limit",
+)
+resumed_sessions_total = Counter(
+    "consensus_resumed_sessions_total",
+    "Number of connections resuming an existing session",
+)
+multi_tab_connections_total = Counter(
+    "consensus_multi_tab_connections_total",
+    "Number of connections replacing another open connection of the same session",
+)
+evicted_sockets_total = Counter(
+    "consensus_evicted_sockets_total",
+    "Number of websockets disconnected because they failed or could not keep up",
+)
+snapshot_restore_duration_seconds = Gauge(
+    "consensus_snapshot_restore_duration_seconds",
+    "Time to restore the rooms from the snapshot on startup",
+)
+startup_to_first_connection_seconds = Gauge(
+    "consensus_startup_to_first_connection_seconds",
+    "Time from loading the app to the first accepted websocket",
+)
+
+ALL_METRICS = [
+    broadcast_duration_seconds,
+    round_result_duration_seconds,
+    game_loop_lag_seconds,
+    active_connections,
+    active_event_streams,
+    guesses_received_total,
+    game_errors_total,
+    rate_limited_guesses_total,
+    resumed_sessions_total,
+    multi_tab_connections_total,
+    evicted_sockets_total,
+    snapshot_restore_duration_seconds,
+    startup_to_first_connection_seconds,
+]
+
+
+def render() -> str:
+    return "\n".join(line for metric in ALL_METRICS for line in metric.render()) + "\n"
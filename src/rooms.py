@@ -0,0 +1,116 @@
+import datetime as dt
+import re
+import time
+from typing import Callable, Union
+
+from src.connectivity import WebsocketConnectionPool
+from src.domain.canonical import DEFAULT_CANONICALIZER, Canonicalizer
+from src.domain.entities import GameError
+from src.game_runner import GameRunner
+from src.log import get_logger
+from src.scheduler import Scheduler
+from src.state_store import StateStore
+
+logger = get_logger("rooms")
+
+DEFAULT_ROOM = "public"
+
+ROOM_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+class RoomManager:
+    """
+    Holds the games of all the rooms, each with its own state and connections
+    All the rooms share a single scheduler, and rooms without players
+    are evicted from memory after a while (except the default room)
+    """
+
+    max_rooms = 5000
+    idle_room_timeout_seconds = 300
+    eviction_interval_seconds = 60
+
+    def __init__(
+        self,
+        scheduler: Scheduler,
+        scoring_engine: str = "python",
+        state_store_factory: Callable[[str], StateStore] = lambda room: StateStore(),
+        connection_pool_factory: Callable[
+            [str], WebsocketConnectionPool
+        ] = lambda room: WebsocketConnectionPool(),
+        progress_interval_seconds: Union[float, None] = None,
+        hide_progress_words: Union[bool, None] = None,
+        canonicalizer: Union[Canonicalizer, None] = DEFAULT_CANONICALIZER,
+    ):
+        self.scheduler = scheduler
+        self.scoring_engine = scoring_engine
+        self.progress_interval_seconds = progress_interval_seconds
+        self.hide_progress_words = hide_progress_words
+        # Shared by all the rooms, so that each distinct word is canonicalized once
+        self.canonicalizer = canonicalizer
+        self.state_store_factory = state_store_factory
+        self.connection_pool_factory = connection_pool_factory
+        self.runner_by_room: dict[str, GameRunner] = {}
+        self._schedule_eviction()
+
+    def get_or_create(
+        self, room: str, state_store: Union[StateStore, None] = None
+    ) -> GameRunner:
+        """
+        state_store is used instead of the factory's if the room is created
+        """
+        if room in self.runner_by_room:
+            return self.runner_by_room[room]
+
+        if not ROOM_NAME_PATTERN.match(room):
+            raise GameError("Invalid room name")
+        if len(self.runner_by_room) >= self.max_rooms:
+            raise GameError("Too many rooms")
+
+        runner = GameRunner(
+            connection_pool=self.connection_pool_factory(room),
+            scheduler=self.scheduler,
+            room=room,
+            scoring_engine=self.scoring_engine,
+            clock=self.scheduler.clock,
+            progress_interval_seconds=self.progress_interval_seconds,
+            hide_progress_words=self.hide_progress_words,
+            canonicalizer=self.canonicalizer,
+            state_store=(
+                state_store
+                if state_store is not None
+                else self.state_store_factory(room)
+            ),
+        )
+        runner.start()
+        self.runner_by_room[room] = runner
+        return runner
+
+    def evict_idle_rooms(self) -> None:
+        now = time.monotonic()
+        idle_rooms = [
+            room
+            for room, runner in self.runner_by_room.items()
+            if room != DEFAULT_ROOM
+            and len(runner.websocket_connection_pool.active_connections) == 0
+            and runner.n_event_streams == 0
+            and now - runner.websocket_connection_pool.last_activity
+            > self.idle_room_timeout_seconds
+        ]
+        for room in idle_rooms:
+            self.runner_by_room.pop(room).stop()
+        if len(idle_rooms) > 0:
+            logger.info("Evicted idle rooms", extra={"n_rooms": len(idle_rooms)})
+
+    def _schedule_eviction(self) -> None:
+        self.scheduler.schedule(
+            self,
+            self.scheduler.clock.now()
+            + dt.timedelta(seconds=self.eviction_interval_seconds),
+            self._run_eviction,
+        )
+
+    async def _run_eviction(self) -> None:
+        try:
+            self.evict_idle_rooms()
+        finally:
+            self._schedule_eviction()
@@ -0,0 +1,94 @@
+import json
+import queue
+import threading
+from typing import Union
+
+from src.domain.entities import GuessList, PlayerName, Round, RoundResult
+from src.log import get_logger
+
+logger = get_logger("round_archive")
+
+
+class RoundArchive:
+    """
+    Append-only log of the rounds evicted from the in-memory history,
+    one JSON object per line
+    Rounds are evicted from the game loop, they are encoded and written by
+    a background thread as this takes time with many players
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="round-archive", daemon=True
+        )
+        self._thread.start()
+
+    def append(
+        self,
+        archived_round: Round,
+        result: Union[RoundResult, None],
+        guesses_by_player_name: dict[PlayerName, GuessList],
+    ) -> None:
+        # Evicted rounds are no longer modified, they can be read from the thread
+        self._queue.put((archived_round, result, guesses_by_player_name))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception:
+                logger.exception(
+                    "Round archive write failed", extra={"event": "archive_failed"}
+                )
+            finally:
+                self._queue.task_done()
+
+    def _write(
+        self,
+        archived_round: Round,
+        result: Union[RoundResult, None],
+        guesses_by_player_name: dict[PlayerName, GuessList],
+    ) -> None:
+        record = {
+            "round_id": str(archived_round.round_id),
+            "theme_word": archived_round.theme_word,
+            "result": (
+                {
+                    "score_by_player_name": result.score_by_player_name,
+                    "value_by_word": result.value_by_word,
+                    "spelling_by_word": result.spelling_by_word,
+                }
+                if result is not None
+                else None
+            ),
+            "guesses": {
+                player_name: guess_list.words
+                for player_name, guess_list in guesses_by_player_name.items()
+            },
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+            f.write("\n")
+
+    def flush(self) -> None:
+        """
+        Wait until the rounds appended so far are written
+        """
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def read(self) -> list[dict]:
+        self.flush()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f]
+        except FileNotFoundError:
+            return []
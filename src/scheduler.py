@@ -0,0 +1,117 @@
+import asyncio
+import datetime as dt
+import heapq
+import itertools
+from typing import Awaitable, Callable, Hashable, Union
+
+from src.clock import WALL_CLOCK, Clock
+from src.log import get_logger
+
+logger = get_logger("scheduler")
+
+
+class Scheduler:
+    """
+    Runs the timers of any number of games on a single task
+    Timers are kept in a heap, and the task sleeps until the earliest deadline
+    or until a timer is added or moved
+    """
+
+    def __init__(self, clock: Clock = WALL_CLOCK):
+        self.clock = clock
+        # Entries are (deadline, sequence number, key), moved or cancelled timers
+        # leave stale entries in the heap that are skipped when reaching the top
+        self._heap: list[tuple[dt.datetime, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._deadline_by_key: dict[Hashable, dt.datetime] = {}
+        self._callback_by_key: dict[Hashable, Callable[[], Awaitable]] = {}
+        self._timers_changed = asyncio.Event()
+        # How late the last timer fired compared to its deadline
+        self.loop_lag_seconds = 0.0
+        # Running callbacks, referenced until done so that they are not
+        # garbage collected
+        self._running_tasks: set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._deadline_by_key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadline_by_key
+
+    def schedule(
+        self, key: Hashable, deadline: dt.datetime, callback: Callable[[], Awaitable]
+    ) -> None:
+        """
+        Run the callback at the deadline, replacing any timer with the same key
+        """
+        self._deadline_by_key[key] = deadline
+        self._callback_by_key[key] = callback
+        heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+        self._timers_changed.set()
+
+    def cancel(self, key: Hashable) -> None:
+        self._deadline_by_key.pop(key, None)
+        self._callback_by_key.pop(key, None)
+
+    def _is_stale(self, entry: tuple[dt.datetime, int, Hashable]) -> bool:
+        deadline, _, key = entry
+        return self._deadline_by_key.get(key) != deadline
+
+    def _peek(self) -> Union[tuple[dt.datetime, Hashable], None]:
+        while len(self._heap) > 0 and self._is_stale(self._heap[0]):
+            heapq.heappop(self._heap)
+        if len(self._heap) == 0:
+            return None
+        deadline, _, key = self._heap[0]
+        return deadline, key
+
+    def _pop(self, key: Hashable) -> Callable[[], Awaitable]:
+        heapq.heappop(self._heap)
+        del self._deadline_by_key[key]
+        return self._callback_by_key.pop(key)
+
+    def pop_next(self) -> Union[tuple[dt.datetime, Callable[[], Awaitable]], None]:
+        """
+        Remove the earliest timer and return its deadline and callback,
+        for drivers running the timers themselves on a virtual clock
+        """
+        next_timer = self._peek()
+        if next_timer is None:
+            return None
+        deadline, key = next_timer
+        return deadline, self._pop(key)
+
+    async def run_forever(self):
+        while True:
+            self._timers_changed.clear()
+            next_timer = self._peek()
+            if next_timer is None:
+                await self._timers_changed.wait()
+                continue
+
+            now = self.clock.now()
+            deadline, key = next_timer
+            delay = (deadline - now).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._timers_changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            callback = self._pop(key)
+            self.loop_lag_seconds = (now - deadline).total_seconds()
+            # Each callback runs in its own task, so that a slow broadcast
+            # in one game does not delay the timers of the other games
+            task = asyncio.create_task(callback())
+            self._running_tasks.add(task)
+            task.add_done_callback(self._on_callback_done)
+
+    def _on_callback_done(self, task: asyncio.Task) -> None:
+        self._running_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Timer callback failed",
+                exc_info=task.exception(),
+                extra={"event": "timer_failed"},
+            )
@@ -0,0 +1,99 @@
+import itertools
+import random
+from typing import Union
+
+from src.clock import VirtualClock
+from src.connectivity import BroadcastReport, WebsocketConnectionPool
+from src.domain.constants import N_GUESSES
+from src.game_runner import GameRunner
+from src.messages import EncodedMessage
+from src.scheduler import Scheduler
+from src.state_store import StateStore
+
+
+class NullConnectionPool(WebsocketConnectionPool):
+    """
+    Drops every message, for games played without clients
+    """
+
+    def __init__(self):
+        super().__init__(report_presence=False)
+
+    def send_many(self, messages: list) -> BroadcastReport:
+        return BroadcastReport(n_connections=0, n_failed=0, duration_seconds=0.0)
+
+    def broadcast(self, message: Union[dict, EncodedMessage]) -> BroadcastReport:
+        return BroadcastReport(n_connections=0, n_failed=0, duration_seconds=0.0)
+
+
+class Simulation:
+    """
+    Plays the rounds of a room on a virtual clock, running each timer as soon
+    as the previous one is done, so that rounds take no wall clock time
+    Players pick their words with a skewed distribution, as real players
+    tend to agree on a few obvious words
+    """
+
+    def __init__(
+        self,
+        n_players: int,
+        state_store: Union[StateStore, None] = None,
+        scoring_engine: str = "python",
+        vocabulary_size: int = 2000,
+        seed: int = 0,
+    ):
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(clock=self.clock)
+        self.runner = GameRunner(
+            NullConnectionPool(),
+            self.scheduler,
+            room="simulation",
+            scoring_engine=scoring_engine,
+            state_store=state_store,
+            clock=self.clock,
+        )
+        self.player_names = [f"player{i}" for i in range(n_players)]
+        self.vocabulary = [f"word{i}" for i in range(vocabulary_size)]
+        self.cum_weights = list(
+            itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size))
+        )
+        self.rng = random.Random(seed)
+        self.n_rounds_played = 0
+
+    def submit_guesses(self):
+        for player_name in self.player_names:
+            words = set(
+                self.rng.choices(
+                    self.vocabulary, cum_weights=self.cum_weights, k=N_GUESSES
+                )
+            )
+            self.runner.submit_guesses(player_name, list(words), websocket=None)
+
+    async def run_next_timer(self) -> bool:
+        next_timer = self.scheduler.pop_next()
+        if next_timer is None:
+            return False
+        deadline, callback = next_timer
+        self.clock.advance_to(deadline)
+        await callback()
+        return True
+
+    async def play_round(self):
+        """
+        Start a round, submit the guesses of all players then run the timers
+        until the round is completed
+        """
+        if not self.runner.game.has_ongoing_round:
+            if self.runner.game.get_game_state()[0] is None:
+                self.runner.start()
+            else:
+                await self.run_next_timer()
+        self.submit_guesses()
+        while self.runner.game.has_ongoing_round:
+            if not await self.run_next_timer():
+                break
+        self.n_rounds_played += 1
+
+    async def play(self, n_rounds: int):
+        for _ in range(n_rounds):
+            await self.play_round()
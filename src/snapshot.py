@@ -0,0 +1,270 @@
+import asyncio
+import datetime as dt
+import json
+import mmap
+import os
+import struct
+import time
+import uuid
+import zlib
+from typing import Union
+
+from src.domain.aggregates import GameAggregates, RoundSummary
+from src.domain.entities import GameState, GuessList, Round, RoundResult
+from src.game_runner import GameRunner
+from src.log import get_logger
+from src.rooms import RoomManager
+from src.scheduler import Scheduler
+from src.state_store import StateStore
+
+logger = get_logger("snapshot")
+
+# A snapshot file is this header followed by the zlib compressed JSON snapshot
+SNAPSHOT_HEADER = struct.Struct(">4sI")
+SNAPSHOT_MAGIC = b"CSNP"
+SNAPSHOT_VERSION = 1
+
+
+def encode_state(state: GameState) -> dict:
+    """
+    Guesses are stored as columns, so that the payload of a round with many
+    players is mostly the player names and their words
+    """
+    return {
+        "rounds": [[r.round_id.hex, r.theme_word] for r in state.rounds],
+        "results": {
+            round_id.hex: [
+                result.score_by_player_name,
+                result.value_by_word,
+                result.spelling_by_word,
+            ]
+            for round_id, result in state.result_by_round.items()
+        },
+        "spellings": {
+            round_id.hex: spelling_by_word
+            for round_id, spelling_by_word in state.spelling_by_round.items()
+            if len(spelling_by_word) > 0
+        },
+        "guesses": {
+            round_id.hex: [
+                list(guesses_by_player_name.keys()),
+                [guess_list.words for guess_list in guesses_by_player_name.values()],
+            ]
+            for round_id, guesses_by_player_name in state.guesses_by_round_and_player_name.items()
+        },
+    }
+
+
+def restore_state(state_store: StateStore, encoded_state: dict) -> None:
+    """
+    Replay the snapshot through the store, which rebuilds the word counts
+    """
+    for round_id_hex, theme_word in encoded_state["rounds"]:
+        round_id = uuid.UUID(hex=round_id_hex)
+        state_store.add_round(Round(round_id=round_id, theme_word=theme_word))
+        # Absent from the snapshots written before spellings were kept
+        state_store.add_spellings(
+            round_id, encoded_state.get("spellings", {}).get(round_id_hex, {})
+        )
+        player_names, words = encoded_state["guesses"].get(round_id_hex, [[], []])
+        for player_name, player_words in zip(player_names, words):
+            state_store.set_player_guesses(
+                round_id, player_name, GuessList(player_words)
+            )
+        if round_id_hex in encoded_state["results"]:
+            # Scores, values and spellings, the latter being absent from the
+            # snapshots written before spellings were kept
+            state_store.add_round_result(
+                round_id, RoundResult(*encoded_state["results"][round_id_hex])
+            )
+
+
+def encode_aggregates(aggregates: GameAggregates) -> dict:
+    return {
+        "recent_rounds": [
+            [
+                summary.round_id.hex,
+                summary.theme_word,
+                summary.completed_at.isoformat(),
+                summary.n_players,
+                summary.top_value_by_word,
+                summary.top_score_by_player_name,
+            ]
+            for summary in aggregates.recent_rounds
+        ],
+        "period_key_by_period": aggregates.period_key_by_period,
+        "score_by_player_name_by_period": aggregates.score_by_player_name_by_period,
+        "word_counts_by_theme": aggregates.word_counts_by_theme,
+        "spelling_by_word_by_theme": aggregates.spelling_by_word_by_theme,
+    }
+
+
+def restore_aggregates(aggregates: GameAggregates, encoded_aggregates: dict) -> None:
+    for (
+        round_id_hex,
+        theme_word,
+        completed_at,
+        n_players,
+        top_value_by_word,
+        top_score_by_player_name,
+    ) in encoded_aggregates["recent_rounds"]:
+        aggregates.recent_rounds.append(
+            RoundSummary(
+                round_id=uuid.UUID(hex=round_id_hex),
+                theme_word=theme_word,
+                completed_at=dt.datetime.fromisoformat(completed_at),
+                n_players=n_players,
+                top_value_by_word=[tuple(item) for item in top_value_by_word],
+                top_score_by_player_name=[
+                    tuple(item) for item in top_score_by_player_name
+                ],
+            )
+        )
+    aggregates.period_key_by_period = encoded_aggregates["period_key_by_period"]
+    aggregates.score_by_player_name_by_period = encoded_aggregates[
+        "score_by_player_name_by_period"
+    ]
+    aggregates.word_counts_by_theme = encoded_aggregates["word_counts_by_theme"]
+    aggregates.spelling_by_word_by_theme = encoded_aggregates.get(
+        "spelling_by_word_by_theme", {}
+    )
+    aggregates.version += 1
+
+
+def encode_snapshot(runner_by_room: dict[str, GameRunner]) -> bytes:
+    snapshot = {
+        "rooms": {
+            room: {
+                "next_switch": runner.next_switch.isoformat(),
+                "state": encode_state(runner.game.state.state),
+                "aggregates": encode_aggregates(runner.game.aggregates),
+            }
+            for room, runner in runner_by_room.items()
+        }
+    }
+    payload = json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False)
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + zlib.compress(
+        payload.encode(), level=1
+    )
+
+
+def decode_snapshot(data) -> dict:
+    """
+    data can be any buffer, such as a memory map of the snapshot file
+    """
+    magic, version = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot format")
+    with memoryview(data) as view:
+        payload = zlib.decompress(view[SNAPSHOT_HEADER.size :])
+    return json.loads(payload)
+
+
+def read_snapshot_file(path: str) -> Union[dict, None]:
+    """
+    Returns None if there is no usable snapshot, so that the game starts afresh
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            return decode_snapshot(data)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error, zlib.error):
+        logger.exception("Could not read snapshot", extra={"path": path})
+        return None
+
+
+def write_snapshot_file(path: str, data: bytes) -> None:
+    # Written next to the previous snapshot then renamed, so that a crash
+    # while writing never leaves a truncated snapshot
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+class Snapshotter:
+    """
+    Saves the rooms (rounds, results, ongoing guesses, next switch and
+    cross-round aggregates) to a single file periodically and on shutdown,
+    and restores them on startup so that a restarted machine resumes the
+    ongoing rounds
+    """
+
+    interval_seconds = 30
+
+    def __init__(self, path: str, room_manager: RoomManager, scheduler: Scheduler):
+        self.path = path
+        self.room_manager = room_manager
+        self.scheduler = scheduler
+
+    def restore(self) -> int:
+        """
+        Restore the rooms of the snapshot, returns the number of restored rooms
+        A room whose store already holds rounds (e.g. from SQLite) keeps them,
+        and only gets its next switch back if it is at the same round
+        """
+        snapshot = read_snapshot_file(self.path)
+        if snapshot is None:
+            return 0
+        n_restored_rooms = 0
+        for room, room_snapshot in snapshot["rooms"].items():
+            state_store = self.room_manager.state_store_factory(room)
+            encoded_state = room_snapshot["state"]
+            if state_store.get_latest_round() is None:
+                restore_state(state_store, encoded_state)
+            latest_round = state_store.get_latest_round()
+            if latest_round is None:
+                continue
+            runner = self.room_manager.get_or_create(room, state_store=state_store)
+            if "aggregates" in room_snapshot:
+                restore_aggregates(runner.game.aggregates, room_snapshot["aggregates"])
+            if (
+                len(encoded_state["rounds"]) > 0
+                and latest_round.round_id.hex == encoded_state["rounds"][-1][0]
+            ):
+                # A switch that was due while the machine was stopped fires right away
+                runner.next_switch = dt.datetime.fromisoformat(
+                    room_snapshot["next_switch"]
+                )
+            n_restored_rooms += 1
+        return n_restored_rooms
+
+    def save(self) -> None:
+        write_snapshot_file(
+            self.path, encode_snapshot(self.room_manager.runner_by_room)
+        )
+
+    def start(self) -> None:
+        self._schedule()
+
+    def _schedule(self) -> None:
+        self.scheduler.schedule(
+            self,
+            self.scheduler.clock.now() + dt.timedelta(seconds=self.interval_seconds),
+            self._run,
+        )
+
+    async def _run(self) -> None:
+        try:
+            # Encoded on the event loop so that the snapshot is consistent,
+            # the file is written from a thread
+            start = time.perf_counter()
+            data = encode_snapshot(self.room_manager.runner_by_room)
+            await asyncio.to_thread(write_snapshot_file, self.path, data)
+            logger.info(
+                "Saved snapshot",
+                extra={
+                    "event": "snapshot_saved",
+                    "n_bytes": len(data),
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                },
+            )
+        except Exception:
+            logger.exception("Could not save snapshot", extra={"path": self.path})
+        finally:
+            self._schedule()
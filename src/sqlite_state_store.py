@@ -0,0 +1,184 @@
+import json
+import sqlite3
+import time
+import uuid
+from typing import Union
+
+from src.domain.entities import (
+    PlayerName,
+    RoundId,
+    Round,
+    RoundResult,
+    GuessList,
+)
+from src.round_archive import RoundArchive
+from src.state_store import StateStore
+
+
+class SqliteStateStore(StateStore):
+    """
+    Store the state in a SQLite database, so that it survives restarts
+    The latest rounds are still kept in memory and all reads are served from there
+    Guess writes are buffered and flushed in batches, rounds and results are
+    written immediately (flushing the pending guesses first)
+    """
+
+    flush_batch_size = 500
+    flush_interval_seconds = 1.0
+
+    def __init__(
+        self,
+        path: str,
+        max_rounds_stored: Union[int, None] = None,
+        archive: Union[RoundArchive, None] = None,
+    ):
+        super().__init__(max_rounds_stored=max_rounds_stored, archive=archive)
+        # The store may be created before the event loop thread starts,
+        # but it is then only used from that thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL is still safe against corruption, only the last
+        # transactions may be lost on power failure
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS rounds (
+                round_id TEXT PRIMARY KEY,
+                theme_word TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS round_results (
+                round_id TEXT PRIMARY KEY,
+                result TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS guesses (
+                round_id TEXT NOT NULL,
+                player_name TEXT NOT NULL,
+                words TEXT NOT NULL,
+                PRIMARY KEY (round_id, player_name)
+            );
+            CREATE TABLE IF NOT EXISTS spellings (
+                round_id TEXT NOT NULL,
+                word TEXT NOT NULL,
+                spelling TEXT NOT NULL,
+                PRIMARY KEY (round_id, word)
+            );
+            """)
+        self.connection.commit()
+
+        self._pending_guesses: dict[tuple[RoundId, PlayerName], GuessList] = {}
+        self._pending_spellings: list[tuple[str, str, str]] = []
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Load the latest rounds in memory, without writing them back
+        """
+        rows = self.connection.execute(
+            "SELECT round_id, theme_word FROM rounds ORDER BY rowid DESC LIMIT ?",
+            (self.max_rounds_stored,),
+        ).fetchall()
+        for round_id, theme_word in reversed(rows):
+            round_id = uuid.UUID(round_id)
+            StateStore.add_round(self, Round(round_id=round_id, theme_word=theme_word))
+            StateStore.add_spellings(
+                self,
+                round_id,
+                dict(
+                    self.connection.execute(
+                        "SELECT word, spelling FROM spellings WHERE round_id = ?",
+                        (str(round_id),),
+                    )
+                ),
+            )
+            for player_name, words in self.connection.execute(
+                "SELECT player_name, words FROM guesses WHERE round_id = ?",
+                (str(round_id),),
+            ):
+                StateStore.set_player_guesses(
+                    self, round_id, player_name, GuessList(json.loads(words))
+                )
+            result_row = self.connection.execute(
+                "SELECT result FROM round_results WHERE round_id = ?",
+                (str(round_id),),
+            ).fetchone()
+            if result_row is not None:
+                StateStore.add_round_result(
+                    self, round_id, RoundResult(**json.loads(result_row[0]))
+                )
+
+    def flush(self) -> None:
+        if len(self._pending_spellings) > 0:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO spellings (round_id, word, spelling) "
+                "VALUES (?, ?, ?)",
+                self._pending_spellings,
+            )
+            self.connection.commit()
+            self._pending_spellings = []
+        if len(self._pending_guesses) > 0:
+            pending_guesses = self._pending_guesses.items()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO guesses (round_id, player_name, words) "
+                "VALUES (?, ?, ?)",
+                [
+                    (str(round_id), player_name, json.dumps(guess_list.words))
+                    for (round_id, player_name), guess_list in pending_guesses
+                ],
+            )
+            self.connection.commit()
+            self._pending_guesses = {}
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def add_round(self, round_to_add: Round) -> None:
+        self.flush()
+        self.connection.execute(
+            "INSERT INTO rounds (round_id, theme_word) VALUES (?, ?)",
+            (str(round_to_add.round_id), round_to_add.theme_word),
+        )
+        self.connection.commit()
+        super().add_round(round_to_add)
+
+    def add_round_result(self, round_id: RoundId, result: RoundResult) -> None:
+        self.flush()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO round_results (round_id, result) VALUES (?, ?)",
+            (
+                str(round_id),
+                json.dumps(
+                    {
+                        "score_by_player_name": result.score_by_player_name,
+                        "value_by_word": result.value_by_word,
+                        "spelling_by_word": result.spelling_by_word,
+                    }
+                ),
+            ),
+        )
+        self.connection.commit()
+        super().add_round_result(round_id, result)
+
+    def add_spellings(
+        self, round_id: RoundId, spelling_by_word: dict[str, str]
+    ) -> dict[str, str]:
+        added_spelling_by_word = super().add_spellings(round_id, spelling_by_word)
+        # Written with the next batch of guesses
+        self._pending_spellings.extend(
+            (str(round_id), word, spelling)
+            for word, spelling in added_spelling_by_word.items()
+        )
+        return added_spelling_by_word
+
+    def set_player_guesses(
+        self, round_id: RoundId, player_name: PlayerName, guess_list: GuessList
+    ) -> None:
+        super().set_player_guesses(round_id, player_name, guess_list)
+        # Only the latest guesses of each player need to be written
+        self._pending_guesses[(round_id, player_name)] = guess_list
+        if (
+            len(self._pending_guesses) >= self.flush_batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval_seconds
+        ):
+            self.flush()
@@ -6,40 +6,56 @@ from src.domain.entities import (
     GuessList,
     GameState,
 )
+from src.round_archive import RoundArchive
 
+from collections import deque
 from typing import Union
 
 
 class StateStore:
     """
     Store the state in memory
+    Only the last max_rounds_stored rounds are kept
     """
 
     max_rounds_stored = 10
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_rounds_stored: Union[int, None] = None,
+        archive: Union[RoundArchive, None] = None,
+    ):
+        if max_rounds_stored is not None:
+            # The latest round must be kept, it is the ongoing one
+            if max_rounds_stored < 1:
+                raise ValueError("max_rounds_stored must be at least 1")
+            self.max_rounds_stored = max_rounds_stored
+        # Rounds evicted from memory are appended to the archive, if any
+        self.archive = archive
         self.state = GameState(
-            rounds=[], result_by_round={}, guesses_by_round_and_player_name={}
+            rounds=deque(),
+            result_by_round={},
+            guesses_by_round_and_player_name={},
+            word_counts_by_round={},
+            vocabulary_by_round={},
+            spelling_by_round={},
         )
 
-    def cleanup(self) -> None:
+    def evict_oldest_round(self) -> None:
         """
-        Since we store the rounds in memory, only keep the last few rounds
+        The rounds are kept in a ring buffer, only the last few are kept in memory
+        and the oldest one is dropped in constant time when a round is added
         """
-        if len(self.state.rounds) > self.max_rounds_stored:
-            self.state.rounds = self.state.rounds[-self.max_rounds_stored :]
-
-        allowed_round_ids = set(r.round_id for r in self.state.rounds)
-        self.state.result_by_round = {
-            round_id: result
-            for round_id, result in self.state.result_by_round.items()
-            if round_id in allowed_round_ids
-        }
-        self.state.guesses_by_round_and_player_name = {
-            round_id: guesses_dict
-            for round_id, guesses_dict in self.state.guesses_by_round_and_player_name.items()
-            if round_id in allowed_round_ids
-        }
+        evicted_round = self.state.rounds.popleft()
+        result = self.state.result_by_round.pop(evicted_round.round_id, None)
+        guesses_by_player_name = self.state.guesses_by_round_and_player_name.pop(
+            evicted_round.round_id
+        )
+        del self.state.word_counts_by_round[evicted_round.round_id]
+        del self.state.vocabulary_by_round[evicted_round.round_id]
+        del self.state.spelling_by_round[evicted_round.round_id]
+        if self.archive is not None:
+            self.archive.append(evicted_round, result, guesses_by_player_name)
 
     def get_latest_round(self) -> Union[Round, None]:
         if len(self.state.rounds) == 0:
@@ -49,8 +65,12 @@ class StateStore:
     def add_round(self, round_to_add: Round) -> None:
         self.state.rounds.append(round_to_add)
         self.state.guesses_by_round_and_player_name[round_to_add.round_id] = {}
+        self.state.word_counts_by_round[round_to_add.round_id] = {}
+        self.state.vocabulary_by_round[round_to_add.round_id] = {}
+        self.state.spelling_by_round[round_to_add.round_id] = {}
 
-        self.cleanup()
+        while len(self.state.rounds) > self.max_rounds_stored:
+            self.evict_oldest_round()
 
     def get_round_result(self, round_id: RoundId) -> RoundResult:
         return self.state.result_by_round.get(round_id)
@@ -68,9 +88,54 @@ class StateStore:
     def set_player_guesses(
         self, round_id: RoundId, player_name: PlayerName, guess_list: GuessList
     ) -> None:
-        self.state.guesses_by_round_and_player_name[round_id][player_name] = guess_list
+        """
+        Replace the player's guesses, and update the word counts of the round
+        by removing the previous guesses and adding the new ones
+        The words are replaced by their instance in the vocabulary of the round,
+        so that each distinct word is stored once whatever the number of players
+        """
+        guesses_by_player_name = self.state.guesses_by_round_and_player_name[round_id]
+        word_counts = self.state.word_counts_by_round[round_id]
+        vocabulary = self.state.vocabulary_by_round[round_id]
+        guess_list.words = tuple(
+            vocabulary.setdefault(word, word) for word in guess_list.words
+        )
+
+        previous_guess_list = guesses_by_player_name.get(player_name)
+        if previous_guess_list is not None:
+            for word in previous_guess_list.words:
+                word_counts[word] -= 1
+                if word_counts[word] == 0:
+                    del word_counts[word]
+        for word in guess_list.words:
+            word_counts[word] = word_counts.get(word, 0) + 1
+
+        guesses_by_player_name[player_name] = guess_list
 
     def get_all_guesses_for_round(
         self, round_id: RoundId
     ) -> dict[PlayerName, GuessList]:
         return self.state.guesses_by_round_and_player_name[round_id]
+
+    def get_word_counts_for_round(self, round_id: RoundId) -> dict[str, int]:
+        return self.state.word_counts_by_round[round_id]
+
+    def add_spellings(
+        self, round_id: RoundId, spelling_by_word: dict[str, str]
+    ) -> dict[str, str]:
+        """
+        Called before the guesses are set, so that only the first spelling
+        received for each word is kept: returns the spellings added
+        """
+        spellings = self.state.spelling_by_round[round_id]
+        word_counts = self.state.word_counts_by_round[round_id]
+        added_spelling_by_word = {
+            word: spelling
+            for word, spelling in spelling_by_word.items()
+            if word not in spellings and word not in word_counts
+        }
+        spellings.update(added_spelling_by_word)
+        return added_spelling_by_word
+
+    def get_spellings_for_round(self, round_id: RoundId) -> dict[str, str]:
+        return self.state.spelling_by_round[round_id]
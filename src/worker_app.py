@@ -0,0 +1,85 @@
+import os
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+
+from src import metrics
+from src.broker import UnixSocketBrokerClient
+from src.connectivity import InvalidClientMessage, receive_client_message
+from src.cors import add_cors_middleware
+from src.fanout import WorkerRelay
+from src.log import configure_logging, stop_logging
+from src.messages import negotiate_protocol
+from src.rooms import DEFAULT_ROOM
+
+# Websocket worker of the multi-worker mode: the game itself runs in the
+# process started with PROCESS_ROLE=game, reached on BROKER_SOCKET_PATH
+# Several of these can run behind the same port (uvicorn --workers)
+
+configure_logging()
+
+app = FastAPI()
+add_cors_middleware(app)
+
+relay = WorkerRelay(
+    UnixSocketBrokerClient(os.environ.get("BROKER_SOCKET_PATH", "/tmp/consensus.sock"))
+)
+
+
+# Only the connection metrics are updated in workers, the game ones are
+# exposed by the game process
+metrics.active_connections.set_function(lambda: len(relay.websocket_by_connection_id))
+
+
+@app.on_event("startup")
+async def app_startup():
+    await relay.start()
+
+
+@app.on_event("shutdown")
+async def app_shutdown():
+    await relay.client.close()
+    stop_logging()
+
+
+@app.get("/")
+def healthcheck():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    Same protocol as the websocket endpoint of src.app, relayed to the game process
+    """
+    player_name = websocket.query_params["player_name"]
+    room = websocket.query_params.get("room", DEFAULT_ROOM)
+    protocol, subprotocol = negotiate_protocol(
+        websocket.query_params.get("protocol"), websocket.scope.get("subprotocols", [])
+    )
+    connection_id = await relay.connect(
+        websocket,
+        room,
+        player_name,
+        protocol=protocol,
+        subprotocol=subprotocol,
+        session_id=websocket.query_params.get("session_id"),
+        state_tag=websocket.query_params.get("state_tag"),
+    )
+    try:
+        while True:
+            try:
+                data = await receive_client_message(websocket, protocol)
+            except InvalidClientMessage as e:
+                relay.send_error(connection_id, str(e))
+                continue
+            relay.submit_guesses(connection_id, data["words"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        relay.disconnect(connection_id)
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+
+class RecordingHub:
+    """
+    Broker hub keeping the frames published by the game process
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def publish(self, frame, worker_id=None):
+        self.frames.append(frame)
+
+    def messages_to(self, connection):
+        return [
+            json.loads(text)
+            for frame in self.frames
+            if frame["kind"] == "send"
+            for connection_id, _, text in frame["messages"]
+            if connection_id == connection.connection_id
+        ]
+
+
+@pytest.fixture
+def hub():
+    return RecordingHub()
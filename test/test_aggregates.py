@@ -0,0 +1,74 @@
+import datetime as dt
+import uuid
+
+from src.domain.aggregates import GameAggregates
+from src.domain.entities import Round, RoundResult
+
+
+def make_round(theme_word: str) -> Round:
+    return Round(round_id=uuid.uuid4(), theme_word=theme_word)
+
+
+def test_aggregates_are_updated_with_each_round():
+    aggregates = GameAggregates()
+    monday = dt.datetime(2024, 1, 1, 12, tzinfo=dt.timezone.utc)
+    aggregates.add_round_result(
+        make_round("Plage"),
+        RoundResult(
+            score_by_player_name={"a": 1, "b": 1, "c": 0},
+            value_by_word={"sable": 1, "mer": 0},
+        ),
+        completed_at=monday,
+    )
+    aggregates.add_round_result(
+        make_round("Plage"),
+        RoundResult(score_by_player_name={"a": 2}, value_by_word={"sable": 0}),
+        completed_at=monday + dt.timedelta(days=1),
+    )
+
+    assert aggregates.word_counts_by_theme == {"Plage": {"sable": 3, "mer": 1}}
+    assert aggregates.get_word_popularity("Plage", limit=1) == [("sable", 3)]
+    assert [summary.n_players for summary in aggregates.recent_rounds] == [3, 1]
+
+    tuesday = monday + dt.timedelta(days=1)
+    assert aggregates.get_leaderboard("all_time", tuesday).get_page(0, 10) == [
+        (1, "a", 3),
+        (2, "b", 1),
+        (3, "c", 0),
+    ]
+    assert aggregates.get_leaderboard("weekly", tuesday).n_players == 3
+    assert aggregates.get_leaderboard("daily", tuesday).get_page(0, 10) == [(1, "a", 2)]
+
+    # A new day starts without any round completed
+    version = aggregates.version
+    assert (
+        aggregates.get_leaderboard("daily", tuesday + dt.timedelta(days=1)).n_players
+        == 0
+    )
+    assert aggregates.version > version
+
+
+def test_word_popularity_is_shown_with_the_spelling_of_the_players():
+    aggregates = GameAggregates()
+    now = dt.datetime(2024, 1, 1, 12, tzinfo=dt.timezone.utc)
+    aggregates.add_round_result(
+        make_round("Plage"),
+        RoundResult(
+            score_by_player_name={"a": 1, "b": 1},
+            value_by_word={"cafe": 1},
+            spelling_by_word={"cafe": "café"},
+        ),
+        completed_at=now,
+    )
+    aggregates.add_round_result(
+        make_round("Plage"),
+        RoundResult(
+            score_by_player_name={"a": 0},
+            value_by_word={"cafe": 0},
+            spelling_by_word={"cafe": "cafés"},
+        ),
+        completed_at=now,
+    )
+
+    assert aggregates.word_counts_by_theme == {"Plage": {"cafe": 3}}
+    assert aggregates.get_word_popularity("Plage", limit=1) == [("café", 3)]
@@ -0,0 +1,147 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app as app_module
+from src.rooms import DEFAULT_ROOM
+
+
+@pytest.fixture(scope="module")
+def client():
+    # One client for the module, as the rooms of the app live in its event loop
+    with TestClient(app_module.app) as client:
+        yield client
+
+
+def is_round_completed(client) -> bool:
+    return client.get("/state").json()["data"]["round"]["is_completed"]
+
+
+def wait_for_completed_round(client):
+    if not is_round_completed(client):
+        client.post("/switch")
+    for _ in range(100):
+        if is_round_completed(client):
+            return
+        time.sleep(0.02)
+    raise AssertionError("The round did not complete")
+
+
+def receive_until_error(websocket) -> list[dict]:
+    # The error reply to an invalid frame marks the end of the pending messages
+    websocket.send_text("not json")
+    messages = []
+    while len(messages) == 0 or messages[-1]["type"] != "error":
+        messages.append(websocket.receive_json())
+    return messages
+
+
+def test_websocket_session_is_resumed(client):
+    with client.websocket_connect("/ws?player_name=Anog") as websocket:
+        messages = receive_until_error(websocket)
+    assert [message["type"] for message in messages] == [
+        "session",
+        "players_info",
+        "game_state",
+        "error",
+    ]
+    session_id = messages[0]["data"]["session_id"]
+    state_tag = messages[2]["data"]["state_tag"]
+
+    # Up to date: neither a new session nor the game state
+    with client.websocket_connect(
+        f"/ws?player_name=Anog&session_id={session_id}&state_tag={state_tag}"
+    ) as websocket:
+        messages = receive_until_error(websocket)
+    assert [message["type"] for message in messages] == ["players_info", "error"]
+    assert messages[0]["data"] == {"n_players": 1}
+
+    with client.websocket_connect(
+        f"/ws?player_name=Anog&session_id={session_id}&state_tag=outdated"
+    ) as websocket:
+        messages = receive_until_error(websocket)
+    assert [message["type"] for message in messages] == [
+        "players_info",
+        "game_state",
+        "error",
+    ]
+
+
+def test_state_long_poll(client):
+    response = client.get("/state")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.json()["type"] == "game_state"
+    assert etag == f'"{response.json()["data"]["state_tag"]}"'
+
+    assert client.get("/state", headers={"If-None-Match": etag}).status_code == 304
+    state_tag = etag.strip('"')
+    assert client.get("/state", params={"state_tag": state_tag}).status_code == 304
+
+    # Unchanged state at the end of the wait
+    response = client.get(
+        "/state", params={"wait": 0.1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        long_poll = executor.submit(
+            client.get, "/state", params={"wait": 10}, headers={"If-None-Match": etag}
+        )
+        time.sleep(0.2)
+        assert not long_poll.done()
+        client.post("/switch")
+        response = long_poll.result(timeout=5)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.headers["etag"] == f'"{response.json()["data"]["state_tag"]}"'
+
+
+@pytest.mark.parametrize("path", ["/standings", "/leaderboard", "/history"])
+def test_cached_endpoints_answer_not_modified(client, path):
+    wait_for_completed_round(client)
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(path, headers={"If-None-Match": '"outdated"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
+
+
+def test_event_stream(client, monkeypatch):
+    monkeypatch.setattr(app_module, "event_stream_keepalive_seconds", 0.05)
+    runner = app_module.room_manager.runner_by_room[DEFAULT_ROOM]
+    # The test client only returns a streaming response once it ends, so the
+    # stream is read from the endpoint in the event loop of the app
+    response = client.portal.call(app_module.events, DEFAULT_ROOM)
+    assert response.media_type == "text/event-stream"
+    assert response.headers["cache-control"] == "no-cache"
+    chunks = response.body_iterator
+
+    event = client.portal.call(chunks.__anext__)
+    assert runner.n_event_streams == 1
+    header, data, end = event.split(b"\n", 2)
+    assert header == b"event: game_state"
+    assert json.loads(data.removeprefix(b"data: ")) == client.get("/state").json()
+    assert end == b"\n"
+
+    assert client.portal.call(chunks.__anext__) == b": keepalive\n\n"
+
+    client.post("/switch")
+    event = client.portal.call(chunks.__anext__)
+    while event == b": keepalive\n\n":
+        event = client.portal.call(chunks.__anext__)
+    assert event.startswith(b"event: game_state\ndata: ")
+
+    client.portal.call(chunks.aclose)
+    assert runner.n_event_streams == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+from src.broker import (
+    LocalBrokerHub,
+    UnixSocketBrokerClient,
+    UnixSocketBrokerHub,
+)
+
+
+async def exchange_frames(hub, make_client):
+    hub_received = []
+    await hub.start(lambda worker_id, frame: hub_received.append((worker_id, frame)))
+
+    received_by_client = [[], []]
+    clients = [make_client(), make_client()]
+    for client, received in zip(clients, received_by_client):
+        await client.connect(received.append)
+    await asyncio.sleep(0.05)
+
+    clients[0].send({"kind": "guesses", "words": ["café"]})
+    await asyncio.sleep(0.05)
+    assert len(hub_received) == 1
+    worker_id, frame = hub_received[0]
+    assert frame == {"kind": "guesses", "words": ["café"]}
+
+    hub.publish({"kind": "broadcast", "text": "all"})
+    hub.publish({"kind": "send", "text": "one"}, worker_id=worker_id)
+    await asyncio.sleep(0.05)
+    assert received_by_client[0] == [
+        {"kind": "broadcast", "text": "all"},
+        {"kind": "send", "text": "one"},
+    ]
+    assert received_by_client[1] == [{"kind": "broadcast", "text": "all"}]
+
+    await clients[0].close()
+    await asyncio.sleep(0.05)
+    assert hub_received[-1] == (worker_id, {"kind": "worker_lost"})
+
+    await clients[1].close()
+    await hub.close()
+
+
+def test_local_broker():
+    hub = LocalBrokerHub()
+    asyncio.run(exchange_frames(hub, hub.client))
+
+
+def test_unix_socket_broker(tmp_path):
+    path = str(tmp_path / "broker.sock")
+    asyncio.run(
+        exchange_frames(UnixSocketBrokerHub(path), lambda: UnixSocketBrokerClient(path))
+    )
+
+
+def test_unix_socket_hub_survives_a_failing_frame(tmp_path):
+    path = str(tmp_path / "broker.sock")
+
+    async def run():
+        hub = UnixSocketBrokerHub(path)
+        hub_received = []
+
+        def on_message(worker_id, frame):
+            if frame.get("kind") == "invalid":
+                raise KeyError("unknown connection")
+            hub_received.append(frame)
+
+        await hub.start(on_message)
+        client = UnixSocketBrokerClient(path)
+        await client.connect(lambda frame: None)
+        await asyncio.sleep(0.05)
+        client.send({"kind": "invalid"})
+        client.send({"kind": "guesses", "words": ["café"]})
+        await asyncio.sleep(0.05)
+        assert hub_received == [{"kind": "guesses", "words": ["café"]}]
+        await client.close()
+        await hub.close()
+
+    asyncio.run(run())
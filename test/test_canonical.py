@@ -0,0 +1,50 @@
+import unicodedata
+
+import pytest
+
+from src.domain.canonical import Canonicalizer
+
+
+def test_spelling_variants_have_the_same_canonical_form():
+    canonicalizer = Canonicalizer()
+    assert canonicalizer.canonicalize("café") == "cafe"
+    assert canonicalizer.canonicalize(unicodedata.normalize("NFD", "café")) == "cafe"
+    assert canonicalizer.canonicalize("chats") == "chat"
+    assert canonicalizer.canonicalize("chevaux") == "cheval"
+    assert canonicalizer.canonicalize("bateaux") == "bateau"
+    assert canonicalizer.canonicalize("l'arbre") == "arbre"
+    assert canonicalizer.canonicalize("l’étés") == "ete"
+    assert canonicalizer.canonicalize("bus") == "bus"
+    assert canonicalizer.canonicalize("l' arbre") == "arbre"
+    assert canonicalizer.canonicalize("l'") == "l'"
+
+
+def test_invariant_and_irregular_plurals():
+    canonicalizer = Canonicalizer()
+    for word in ["fois", "autobus", "prix", "corps", "paris", "mois", "nez", "faux"]:
+        assert canonicalizer.canonicalize(word) == word
+    assert canonicalizer.canonicalize("succès") == "succes"
+    assert canonicalizer.canonicalize("travaux") == "travail"
+    assert canonicalizer.canonicalize("tuyaux") == "tuyau"
+    assert canonicalizer.canonicalize("vitraux") == "vitrail"
+    assert canonicalizer.canonicalize("émaux") == "email"
+
+
+def test_aliases_match_any_spelling_and_results_are_cached():
+    canonicalizer = Canonicalizer(alias_by_word={"autos": "voiture"}, cache_size=2)
+    assert canonicalizer.canonicalize("auto") == "voiture"
+    assert canonicalizer.canonicalize("autos") == "voiture"
+    assert canonicalizer.canonicalize("voitures") == "voiture"
+
+    canonicalizer.canonicalize("voitures")
+    cache_info = canonicalizer.canonicalize.cache_info()
+    assert cache_info.hits == 1
+    assert cache_info.currsize == 2
+
+
+def test_aliases_are_normalized_and_validated():
+    canonicalizer = Canonicalizer(alias_by_word={" Autos": "VOITURE "})
+    assert canonicalizer.canonicalize("auto") == "voiture"
+    for alias_by_word in [{"auto": " "}, {"auto": 1}, {"": "voiture"}]:
+        with pytest.raises(ValueError):
+            Canonicalizer(alias_by_word=alias_by_word)
@@ -0,0 +1,269 @@
+import asyncio
+import json
+
+import pytest
+
+from src.connectivity import (
+    ConnectionWriter,
+    InvalidClientMessage,
+    receive_client_message,
+)
+from src.fanout import RemoteConnection, RemoteConnectionPool, WorkerRelay
+from src.messages import JSON_PROTOCOL, EncodedMessage
+
+
+def test_sessions_are_resumed_and_replace_other_tabs(hub):
+    async def run():
+        pool = RemoteConnectionPool("public", hub)
+        pool.session_resume_seconds = 0.01
+        first, second, third = (RemoteConnection(0, i) for i in range(3))
+
+        assert not pool.register(first, "Anog")
+        session_message, players_info_message = hub.messages_to(first)
+        session_id = session_message["data"]["session_id"]
+        assert players_info_message["data"] == {"n_players": 1}
+
+        # Resuming from another tab closes the first one
+        assert pool.register(second, "Anog", session_id)
+        assert {
+            "kind": "close",
+            "connection_id": first.connection_id,
+            "reason": "Connected from another tab",
+        } in hub.frames
+        pool.disconnect(first)
+        assert pool.session_by_id[session_id].websocket == second
+        assert list(pool.websockets_by_player_name["Anog"]) == [second]
+
+        # A disconnected session can be resumed for a while
+        pool.disconnect(second)
+        assert len(pool.active_connections) == 0
+        assert pool.players_info_message["data"] == {"n_players": 1}
+        assert pool.register(third, "Anog", session_id)
+        pool.disconnect(third)
+        await asyncio.sleep(0.02)
+        assert pool.players_info_message["data"] == {"n_players": 0}
+        assert not pool.register(third, "Anog", session_id)
+
+    asyncio.run(run())
+
+
+def test_presence_changes_within_the_interval_are_broadcast_once(hub):
+    async def run():
+        pool = RemoteConnectionPool("public", hub)
+        pool.presence_interval_seconds = 0.02
+        pool.session_resume_seconds = 0
+        connections = [RemoteConnection(0, i) for i in range(4)]
+
+        for i, connection in enumerate(connections):
+            pool.register(connection, f"Anog{i}")
+        pool.disconnect(connections[1])
+        pool.disconnect(connections[3])
+        await asyncio.sleep(0.05)
+
+        broadcasts = [frame for frame in hub.frames if frame["kind"] == "broadcast"]
+        assert broadcasts == [
+            {
+                "kind": "broadcast",
+                "room": "public",
+                "type": "players_info",
+                "text": '{"type":"players_info","data":{"n_players":2}}',
+            }
+        ]
+
+    asyncio.run(run())
+
+
+class StalledWebsocket:
+    """
+    Holds each send until unblocked, as a client that does not read
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.unblocked = asyncio.Event()
+
+    async def send_text(self, text):
+        await self.unblocked.wait()
+        message = json.loads(text)
+        self.sent.append((message["type"], message.get("data")))
+
+
+def message(message_type, data=None):
+    return EncodedMessage({"type": message_type, "data": data})
+
+
+def test_writer_replaces_pending_messages_of_the_same_type_in_place():
+    async def run():
+        websocket = StalledWebsocket()
+        writer = ConnectionWriter(websocket, on_failure=lambda: None)
+        writer.enqueue(message("error", 0))
+        # Let the writer take the first message and wait on the client
+        await asyncio.sleep(0)
+        writer.enqueue(message("personal_result", 1))
+        writer.enqueue(message("game_state", 1))
+        writer.enqueue(message("personal_result", 2))
+        assert len(writer.pending) == 2
+
+        websocket.unblocked.set()
+        await asyncio.sleep(0.01)
+        assert websocket.sent == [
+            ("error", 0),
+            ("personal_result", 2),
+            ("game_state", 1),
+        ]
+        writer.stop()
+
+    asyncio.run(run())
+
+
+def test_writer_drops_the_oldest_messages_then_gives_up_on_stalled_clients():
+    async def run():
+        websocket = StalledWebsocket()
+        writer = ConnectionWriter(websocket, on_failure=lambda: None)
+        writer.max_pending_messages = 3
+        writer.max_overflow_seconds = 0.01
+        writer.enqueue(message("error", 0))
+        await asyncio.sleep(0)
+
+        assert writer.enqueue(message("game_state"))
+        for i in range(1, 5):
+            assert writer.enqueue(message("error", i))
+        # The oldest errors are dropped, the game state is kept
+        assert [json.loads(m.text) for m in writer.pending.values()] == [
+            {"type": "game_state", "data": None},
+            {"type": "error", "data": 3},
+            {"type": "error", "data": 4},
+        ]
+
+        await asyncio.sleep(0.02)
+        assert not writer.enqueue(message("error", 5))
+        writer.stop()
+
+    asyncio.run(run())
+
+
+def test_writer_evicts_the_oldest_message_when_all_can_be_superseded():
+    async def run():
+        writer = ConnectionWriter(StalledWebsocket(), on_failure=lambda: None)
+        writer.max_pending_messages = 2
+        writer.enqueue(message("error", 0))
+        await asyncio.sleep(0)
+
+        writer.enqueue(message("game_state"))
+        writer.enqueue(message("players_info"))
+        assert writer.enqueue(message("personal_result"))
+        assert list(writer.pending) == ["players_info", "personal_result"]
+        writer.stop()
+
+    asyncio.run(run())
+
+
+def test_writer_reports_sends_that_time_out():
+    async def run():
+        failures = []
+        writer = ConnectionWriter(
+            StalledWebsocket(), on_failure=lambda: failures.append(True)
+        )
+        writer.send_timeout_seconds = 0.01
+        writer.enqueue(message("error"))
+        await asyncio.sleep(0.05)
+        assert failures == [True]
+        assert writer.task.done()
+
+    asyncio.run(run())
+
+
+class FakeWebsocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+class RecordingClient:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, frame):
+        self.frames.append(frame)
+
+
+def test_evicted_connections_are_relayed_until_disconnected():
+    async def run():
+        client = RecordingClient()
+        relay = WorkerRelay(client)
+        evicted, other = FakeWebsocket(), FakeWebsocket()
+        evicted_id = await relay.connect(evicted, "public", "Anog1")
+        other_id = await relay.connect(other, "public", "Anog2")
+
+        # The writer of the first socket gives up before its receive loop notices
+        relay.pool_by_room["public"]._evict(evicted)
+        relay.disconnect(other_id)
+        relay.submit_guesses(evicted_id, ["a"])
+        relay.handle_frame(
+            {"kind": "send", "messages": [[evicted_id, "error", '{"type":"error"}']]}
+        )
+        relay.disconnect(evicted_id)
+
+        assert client.frames[-3:] == [
+            {"kind": "disconnect", "connection_id": other_id},
+            {"kind": "guesses", "connection_id": evicted_id, "words": ["a"]},
+            {"kind": "disconnect", "connection_id": evicted_id},
+        ]
+        assert relay.pool_by_room == {}
+
+    asyncio.run(run())
+
+
+class ReceivingWebsocket:
+    def __init__(self, data=None, error=None):
+        self.data = data
+        self.error = error
+
+    async def receive_json(self):
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+def test_malformed_client_messages_are_rejected():
+    async def run():
+        assert await receive_client_message(
+            ReceivingWebsocket({"words": ["a"]}), JSON_PROTOCOL
+        ) == {"words": ["a"]}
+        for websocket in [
+            ReceivingWebsocket(error=json.JSONDecodeError("Expecting value", "x", 0)),
+            ReceivingWebsocket(error=KeyError("text")),
+            ReceivingWebsocket(["a"]),
+            ReceivingWebsocket({"word": ["a"]}),
+            ReceivingWebsocket({"words": [1]}),
+        ]:
+            with pytest.raises(InvalidClientMessage):
+                await receive_client_message(websocket, JSON_PROTOCOL)
+
+    asyncio.run(run())
+
+
+def test_stalled_clients_hold_only_the_latest_round_progress():
+    async def run():
+        writer = ConnectionWriter(StalledWebsocket(), on_failure=lambda: None)
+        writer.enqueue(message("error", 0))
+        await asyncio.sleep(0)
+
+        writer.enqueue(message("error", 1))
+        for n_submissions in range(20):
+            assert writer.enqueue(message("round_progress", n_submissions))
+        assert [json.loads(m.text) for m in writer.pending.values()] == [
+            {"type": "error", "data": 1},
+            {"type": "round_progress", "data": 19},
+        ]
+        writer.stop()
+
+    asyncio.run(run())
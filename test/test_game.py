@@ -1,6 +1,14 @@
-from src.domain.game import Game
+from src.domain.game import Game, compute_round_result
+from src.domain.scoring import compute_round_result_vectorized
 from src.state_store import StateStore
-from src.domain.entities import GameError, GuessList, Round, RoundResult, RoundId
+from src.domain.entities import (
+    GameError,
+    GuessList,
+    Round,
+    RoundProgress,
+    RoundResult,
+    RoundId,
+)
 
 import pytest
 
@@ -100,3 +108,125 @@ def test_replace_guesses():
         value_by_word={"everyone": 1, "tochange": 0, "justme2": 0},
         score_by_player_name={"Anog1": 1, "Anog2": 1},
     )
+
+
+def test_state_version_changes_only_on_round_transitions():
+    state = StateStore()
+    game = Game(state)
+    assert game.state_version == 0
+
+    game.start_new_round()
+    assert game.state_version == 1
+
+    game.set_guesses(player_name="Anog", guess_list=GuessList(["bonjour"]))
+    assert game.state_version == 1
+
+    game.complete_current_round()
+    assert game.state_version == 2
+
+
+def test_running_word_counts_match_full_computation():
+    state = StateStore()
+    game = Game(state)
+
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["a", "b", "c"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["a", "b"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["b", "d"]))
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["d"]))
+    game.set_guesses(player_name="Anog3", guess_list=GuessList([]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["d", "e", "b"]))
+
+    round, _ = game.get_game_state()
+    assert state.get_word_counts_for_round(round.round_id) == {"b": 1, "d": 2, "e": 1}
+
+    game.complete_current_round()
+    _, result = game.get_game_state()
+    assert result == compute_round_result(
+        state.get_all_guesses_for_round(round.round_id)
+    )
+
+
+def test_round_progress_follows_the_running_word_counts():
+    game = Game(StateStore())
+    assert game.get_round_progress(2) is None
+
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["a", "b"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["b", "c"]))
+    game.set_guesses(player_name="Anog3", guess_list=GuessList(["b", "c"]))
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["c"]))
+    assert game.get_round_progress(2) == RoundProgress(
+        n_submissions=3, n_distinct_words=2, top_word_counts=[("c", 3), ("b", 2)]
+    )
+
+    game.complete_current_round()
+    assert game.get_round_progress(2) is None
+
+
+def test_spelling_variants_are_scored_as_one_word_and_shown_as_sent():
+    game = Game(StateStore())
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["cafés", "chat"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["café", "chats"]))
+    game.set_guesses(player_name="Anog3", guess_list=GuessList(["cafe", "l'café"]))
+    game.complete_current_round()
+
+    _, result = game.get_game_state()
+    assert result == RoundResult(
+        value_by_word={"cafe": 2, "chat": 1},
+        score_by_player_name={"Anog1": 3, "Anog2": 3, "Anog3": 2},
+    )
+    assert result.display_word("cafe") == "cafés"
+    assert result.display_word("chat") == "chat"
+
+
+def test_guesses_are_scored_as_sent_without_canonicalizer():
+    game = Game(StateStore(), canonicalizer=None)
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["café"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["cafe"]))
+    game.complete_current_round()
+
+    _, result = game.get_game_state()
+    assert result.value_by_word == {"café": 0, "cafe": 0}
+
+
+def test_identical_words_are_stored_once_per_round():
+    state = StateStore()
+    # Without the canonicalizer, whose cache would return the same instance
+    game = Game(state, canonicalizer=None)
+    game.start_new_round()
+
+    # Build distinct but equal strings, as decoded from different messages
+    guesses1 = GuessList(["".join(["ch", "at"])])
+    guesses2 = GuessList(["".join(["ch", "at"])])
+    assert guesses1.words[0] is not guesses2.words[0]
+    game.set_guesses(player_name="Anog1", guess_list=guesses1)
+    game.set_guesses(player_name="Anog2", guess_list=guesses2)
+
+    round, _ = game.get_game_state()
+    word1 = state.get_player_guesses(round.round_id, "Anog1").words[0]
+    word2 = state.get_player_guesses(round.round_id, "Anog2").words[0]
+    assert word1 is word2
+
+
+def test_vectorized_scoring_engine_matches_python_engine():
+    guesses_by_player = {
+        "Anog1": GuessList(["everyone", "justme"]),
+        "Anog2": GuessList(["everyone", "2people"]),
+        "Anog3": GuessList(["everyone", "2people", "anotherjustme"]),
+        "Anog4": GuessList([]),
+    }
+    assert compute_round_result_vectorized(guesses_by_player) == compute_round_result(
+        guesses_by_player
+    )
+    assert compute_round_result_vectorized({}) == compute_round_result({})
+
+    game = Game(StateStore(), scoring_engine="numpy")
+    game.start_new_round()
+    for player_name, guess_list in guesses_by_player.items():
+        game.set_guesses(player_name=player_name, guess_list=guess_list)
+    game.complete_current_round()
+    _, result = game.get_game_state()
+    assert result == compute_round_result(guesses_by_player)
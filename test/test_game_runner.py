@@ -0,0 +1,147 @@
+import asyncio
+import datetime as dt
+
+from src.clock import VirtualClock
+from src.fanout import RemoteConnection, RemoteConnectionPool
+from src.game_runner import GameRunner
+from src.scheduler import Scheduler
+
+
+def test_only_the_latest_submission_of_each_player_is_applied(hub):
+    async def run():
+        runner = GameRunner(RemoteConnectionPool("public", hub), Scheduler())
+        runner.start()
+        connection = RemoteConnection(worker_id=0, connection_id=0)
+        runner.submit_guesses("Anog1", ["a"], connection)
+        runner.submit_guesses("Anog1", ["b", "c"], connection)
+        runner.submit_guesses("Anog2", ["b", "b"], connection)
+        latest_round, _ = runner.game.get_game_state()
+        assert runner.game.state.get_word_counts_for_round(latest_round.round_id) == {}
+        # Invalid guess lists are reported without waiting for the ingestion
+        assert hub.frames == [
+            {
+                "kind": "send",
+                "messages": [
+                    [
+                        0,
+                        "error",
+                        '{"type":"error","data":{"message":"Some words are identical"}}',
+                    ]
+                ],
+            }
+        ]
+
+        runner.apply_pending_guesses()
+        assert runner.game.state.get_word_counts_for_round(latest_round.round_id) == {
+            "b": 1,
+            "c": 1,
+        }
+
+        # Pending submissions are applied before the round completes
+        runner.submit_guesses("Anog2", ["b"], connection)
+        runner.advance()
+        _, result = runner.game.get_game_state()
+        assert result.score_by_player_name == {"Anog1": 1, "Anog2": 1}
+
+    asyncio.run(run())
+
+
+def test_invalid_submission_keeps_the_pending_one(hub):
+    async def run():
+        runner = GameRunner(RemoteConnectionPool("public", hub), Scheduler())
+        runner.start()
+        connection = RemoteConnection(worker_id=0, connection_id=0)
+        runner.submit_guesses("Anog", ["a", "b"], connection)
+        runner.submit_guesses("Anog", ["a", "a"], connection)
+        runner.apply_pending_guesses()
+
+        latest_round, _ = runner.game.get_game_state()
+        assert runner.game.state.get_word_counts_for_round(latest_round.round_id) == {
+            "a": 1,
+            "b": 1,
+        }
+        assert hub.messages_to(connection) == [
+            {"type": "error", "data": {"message": "Some words are identical"}}
+        ]
+
+    asyncio.run(run())
+
+
+def test_state_change_wakes_up_waiters(hub):
+    async def run():
+        runner = GameRunner(RemoteConnectionPool("public", hub), Scheduler())
+        runner.start()
+        state_tag = runner.state_tag
+
+        waiter = asyncio.create_task(runner.wait_for_state_change(state_tag, 10))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        runner.advance()
+        runner.broadcast_game_state()
+        await asyncio.wait_for(waiter, 1)
+        assert runner.state_tag != state_tag
+
+        # Returns right away for an outdated tag
+        await asyncio.wait_for(runner.wait_for_state_change(state_tag, 10), 1)
+
+        # Moving the next switch changes the state tag too, e.g. with /switch
+        state_tag = runner.state_tag
+        waiter = asyncio.create_task(runner.wait_for_state_change(state_tag, 10))
+        await asyncio.sleep(0.01)
+        runner.next_switch = runner.clock.now()
+        await asyncio.wait_for(waiter, 1)
+        assert runner.state_tag != state_tag
+
+    asyncio.run(run())
+
+
+def test_round_progress_is_broadcast_at_most_once_per_interval(hub):
+    async def run():
+        clock = VirtualClock()
+        scheduler = Scheduler(clock=clock)
+        runner = GameRunner(
+            RemoteConnectionPool("public", hub),
+            scheduler,
+            clock=clock,
+            progress_interval_seconds=2.0,
+            hide_progress_words=True,
+        )
+        runner.start()
+        connection = RemoteConnection(worker_id=0, connection_id=0)
+
+        async def run_next_timer():
+            deadline, callback = scheduler.pop_next()
+            clock.advance_to(deadline)
+            await callback()
+
+        runner.submit_guesses("Anog1", ["a", "b"], connection)
+        await run_next_timer()  # Ingestion
+        hub.frames.clear()
+        await run_next_timer()  # Progress, right away for the first one
+        assert [frame["type"] for frame in hub.frames] == ["round_progress"]
+        sent_at = clock.now()
+
+        runner.submit_guesses("Anog2", ["b"], connection)
+        await run_next_timer()  # Ingestion
+        runner.submit_guesses("Anog3", ["b", "c"], connection)
+        await run_next_timer()  # Ingestion, included in the pending progress
+        hub.frames.clear()
+        await run_next_timer()  # Progress, one interval after the previous one
+        assert clock.now() == sent_at + dt.timedelta(seconds=2)
+        assert hub.frames == [
+            {
+                "kind": "broadcast",
+                "room": "public",
+                "type": "round_progress",
+                "text": '{"type":"round_progress","data":{"n_submissions":3,'
+                '"n_distinct_words":3,"top_words":[{"count":3},{"count":1},'
+                '{"count":1}]}}',
+            }
+        ]
+
+        # No progress is sent once the round is completed
+        runner.submit_guesses("Anog5", ["d"], connection)
+        runner.advance()
+        assert runner._progress_timer_key not in scheduler
+
+    asyncio.run(run())
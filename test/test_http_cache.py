@@ -0,0 +1,33 @@
+from starlette.requests import Request
+
+from src.http_cache import ResponseCache
+
+
+def make_request(if_none_match=None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def test_responses_are_built_once_per_version_and_revalidated():
+    cache = ResponseCache()
+    n_builds = 0
+
+    def build():
+        nonlocal n_builds
+        n_builds += 1
+        return {"value": n_builds}
+
+    response = cache.respond(make_request(), "key", "v1", build)
+    assert response.status_code == 200
+    assert response.body == b'{"value":1}'
+    assert response.headers["etag"] == '"v1"'
+
+    assert cache.respond(make_request(), "key", "v1", build).body == b'{"value":1}'
+    assert cache.respond(make_request('"v1"'), "key", "v1", build).status_code == 304
+    assert n_builds == 1
+
+    response = cache.respond(make_request('W/"v1"'), "key", "v2", build)
+    assert response.status_code == 200
+    assert response.body == b'{"value":2}'
@@ -0,0 +1,57 @@
+import json
+import logging
+
+from src.log import (
+    JsonFormatter,
+    RateLimitFilter,
+    configure_logging,
+    get_logger,
+    stop_logging,
+)
+
+
+def make_record(message: str, **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord({"msg": message, "levelname": "INFO"})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(
+        JsonFormatter().format(
+            make_record("Player connected", event="player_connected", room="public")
+        )
+    )
+    assert entry["message"] == "Player connected"
+    assert entry["level"] == "INFO"
+    assert entry["event"] == "player_connected"
+    assert entry["room"] == "public"
+
+
+def test_rate_limit_filter_suppresses_and_reports_high_volume_events():
+    rate_limit = RateLimitFilter(max_per_interval=2, interval_seconds=3600)
+    results = [rate_limit.filter(make_record("x", event="connect")) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+    # Records without an event are not limited
+    assert rate_limit.filter(make_record("x"))
+
+    rate_limit.interval_seconds = 0
+    record = make_record("x", event="connect")
+    assert rate_limit.filter(record)
+    assert record.suppressed == 3
+
+
+def test_exceptions_are_logged_through_the_queue(capsys):
+    stop_logging()
+    configure_logging("INFO")
+    try:
+        raise ValueError("invalid frame")
+    except ValueError:
+        get_logger("test").exception("Frame failed", extra={"event": "frame_failed"})
+    stop_logging()
+
+    entry = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert entry["message"] == "Frame failed"
+    assert entry["event"] == "frame_failed"
+    assert entry["level"] == "ERROR"
+    assert "ValueError: invalid frame" in entry["exception"]
@@ -0,0 +1,75 @@
+import msgpack
+
+from src.messages import (
+    EncodedMessage,
+    JSON_PROTOCOL,
+    MSGPACK_PROTOCOL,
+    MSGPACK_SUBPROTOCOL,
+    negotiate_protocol,
+    to_columnar,
+)
+
+
+def test_to_columnar_turns_lists_of_objects_into_columns():
+    assert to_columnar(
+        {
+            "type": "game_state",
+            "data": {
+                "result": {
+                    "ranked_value_by_word": [
+                        {"word": "a", "value": 1},
+                        {"word": "b", "value": 0},
+                    ],
+                    "ranked_score_by_player_name": [],
+                    "n_players": 2,
+                }
+            },
+        }
+    ) == {
+        "type": "game_state",
+        "data": {
+            "result": {
+                "ranked_value_by_word": {"word": ["a", "b"], "value": [1, 0]},
+                "ranked_score_by_player_name": {"player_name": [], "score": []},
+                "n_players": 2,
+            }
+        },
+    }
+    assert to_columnar({"words": ["a", "b"]}) == {"words": ["a", "b"]}
+
+
+def test_to_columnar_columns_do_not_depend_on_the_rows():
+    assert to_columnar({"top_words": []}) == {"top_words": {"word": [], "count": []}}
+    assert to_columnar({"top_words": [{"count": 3}, {"word": "a", "count": 2}]}) == {
+        "top_words": {"word": [None, "a"], "count": [3, 2]}
+    }
+
+
+def test_negotiate_protocol():
+    assert negotiate_protocol(None, []) == (JSON_PROTOCOL, None)
+    assert negotiate_protocol("msgpack", []) == (MSGPACK_PROTOCOL, None)
+    assert negotiate_protocol(None, ["other", MSGPACK_SUBPROTOCOL]) == (
+        MSGPACK_PROTOCOL,
+        MSGPACK_SUBPROTOCOL,
+    )
+
+
+def test_msgpack_encoding():
+    message = {"type": "players_info", "data": {"n_players": 3}}
+
+    assert msgpack.unpackb(EncodedMessage(message).msgpack) == message
+    encoded = EncodedMessage(message)
+    assert (
+        msgpack.unpackb(EncodedMessage.from_text(encoded.type, encoded.text).msgpack)
+        == message
+    )
+
+
+def test_encoded_message_as_server_sent_event():
+    message = EncodedMessage({"type": "game_state", "data": {"theme_word": "été"}})
+    assert (
+        message.event_stream
+        == (
+            'event: game_state\ndata: {"type":"game_state","data":{"theme_word":"été"}}\n\n'
+        ).encode()
+    )
@@ -0,0 +1,32 @@
+from src.metrics import Counter, Gauge, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_duration_seconds", "A test", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    assert histogram.render() == [
+        "# HELP test_duration_seconds A test",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{le="0.1"} 2',
+        'test_duration_seconds_bucket{le="1"} 3',
+        'test_duration_seconds_bucket{le="+Inf"} 4',
+        "test_duration_seconds_sum 3.65",
+        "test_duration_seconds_count 4",
+    ]
+
+
+def test_counter_and_gauge():
+    counter = Counter("test_total", "A counter")
+    counter.inc()
+    counter.inc(2)
+    assert counter.render()[-1] == "test_total 3"
+
+    gauge = Gauge("test_gauge", "A gauge")
+    gauge.set(5)
+    assert gauge.render()[-1] == "test_gauge 5"
+    gauge.set_function(lambda: 7)
+    assert gauge.render()[-1] == "test_gauge 7"
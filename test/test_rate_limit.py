@@ -0,0 +1,19 @@
+from src.rate_limit import TokenBucket
+
+
+def test_token_bucket_allows_bursts_then_refills():
+    bucket = TokenBucket(rate_per_second=10, capacity=2)
+    assert bucket.try_consume()
+    assert bucket.try_consume()
+    assert not bucket.try_consume()
+
+    # As if 0.15 seconds had passed: 1.5 tokens are refilled
+    bucket.updated_at -= 0.15
+    assert bucket.try_consume()
+    assert not bucket.try_consume()
+
+    # Never refilled above the capacity
+    bucket.updated_at -= 60
+    assert bucket.try_consume()
+    assert bucket.try_consume()
+    assert not bucket.try_consume()
@@ -0,0 +1,84 @@
+import asyncio
+import datetime as dt
+
+from src.clock import VirtualClock
+from src.scheduler import Scheduler
+
+
+def test_timers_fire_in_deadline_order_and_can_be_moved():
+    fired = []
+
+    async def run():
+        scheduler = Scheduler()
+        now = dt.datetime.now(dt.timezone.utc)
+
+        def record(key):
+            async def callback():
+                fired.append(key)
+
+            return callback
+
+        scheduler.schedule("late", now + dt.timedelta(seconds=0.05), record("late"))
+        scheduler.schedule("moved", now + dt.timedelta(seconds=60), record("moved"))
+        scheduler.schedule("cancelled", now, record("cancelled"))
+        scheduler.cancel("cancelled")
+        task = asyncio.create_task(scheduler.run_forever())
+
+        await asyncio.sleep(0.01)
+        assert fired == []
+        # Moving a timer wakes up the scheduler
+        scheduler.schedule("moved", now, record("moved"))
+        await asyncio.sleep(0.01)
+        assert fired == ["moved"]
+
+        await asyncio.sleep(0.1)
+        assert fired == ["moved", "late"]
+        assert len(scheduler) == 0
+        assert scheduler.loop_lag_seconds >= 0
+        task.cancel()
+
+    asyncio.run(run())
+
+
+def test_pop_next_returns_the_earliest_timer_on_a_virtual_clock():
+    clock = VirtualClock()
+    scheduler = Scheduler(clock=clock)
+    fired = []
+
+    async def callback():
+        fired.append(clock.now())
+
+    async def run():
+        later = clock.now() + dt.timedelta(seconds=60)
+        scheduler.schedule("b", later, callback)
+        scheduler.schedule("a", clock.now() + dt.timedelta(seconds=80), callback)
+        scheduler.schedule("a", clock.now() + dt.timedelta(seconds=20), callback)
+        deadline, timer_callback = scheduler.pop_next()
+        clock.advance_to(deadline)
+        await timer_callback()
+        deadline, timer_callback = scheduler.pop_next()
+        clock.advance_to(deadline)
+        await timer_callback()
+        assert scheduler.pop_next() is None
+        assert fired == [clock.start + dt.timedelta(seconds=20), later]
+
+    asyncio.run(run())
+
+
+def test_failing_callbacks_are_logged(caplog):
+    async def run():
+        scheduler = Scheduler()
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        scheduler.schedule("failing", scheduler.clock.now(), fail)
+        task = asyncio.create_task(scheduler.run_forever())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        assert len(scheduler._running_tasks) == 0
+
+    asyncio.run(run())
+    [record] = [r for r in caplog.records if r.name == "consensus.scheduler"]
+    assert record.event == "timer_failed"
+    assert str(record.exc_info[1]) == "boom"
@@ -0,0 +1,25 @@
+import asyncio
+import datetime as dt
+
+from src.domain.constants import INTER_ROUND_DURATION_SECONDS, ROUND_DURATION_SECONDS
+from src.simulation import Simulation
+from src.state_store import StateStore
+
+
+def test_rounds_are_played_on_the_virtual_clock_and_evicted():
+    simulation = Simulation(
+        n_players=20, state_store=StateStore(max_rounds_stored=3), vocabulary_size=50
+    )
+    asyncio.run(simulation.play(10))
+
+    state = simulation.runner.game.state
+    assert len(state.state.rounds) == 3
+    latest_round, result = simulation.runner.game.get_game_state()
+    assert result is not None
+    assert len(result.score_by_player_name) == 20
+    assert simulation.clock.now() - simulation.clock.start == dt.timedelta(
+        seconds=10 * ROUND_DURATION_SECONDS + 9 * INTER_ROUND_DURATION_SECONDS
+    )
+    assert simulation.runner.game.aggregates.recent_rounds[-1].round_id == (
+        latest_round.round_id
+    )
@@ -0,0 +1,85 @@
+import datetime as dt
+
+from src.clock import VirtualClock
+from src.domain.entities import GuessList
+from src.rooms import RoomManager
+from src.scheduler import Scheduler
+from src.snapshot import Snapshotter, read_snapshot_file
+
+
+def test_rooms_are_restored_from_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    room_manager = RoomManager(scheduler=Scheduler())
+    runner = room_manager.get_or_create("room1")
+    game = runner.game
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["a", "b"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["a"]))
+    game.complete_current_round()
+    completed_round, result = game.get_game_state()
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["c", "d"]))
+    ongoing_round, _ = game.get_game_state()
+    next_switch = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    runner.next_switch = next_switch
+    Snapshotter(path, room_manager, room_manager.scheduler).save()
+
+    restored_room_manager = RoomManager(scheduler=Scheduler())
+    assert Snapshotter(path, restored_room_manager, Scheduler()).restore() == 1
+    restored_runner = restored_room_manager.runner_by_room["room1"]
+    restored_state = restored_runner.game.state
+    assert list(restored_state.state.rounds) == [completed_round, ongoing_round]
+    assert restored_state.get_round_result(completed_round.round_id) == result
+    assert restored_state.get_player_guesses(ongoing_round.round_id, "Anog1").words == (
+        "c",
+        "d",
+    )
+    assert restored_state.get_word_counts_for_round(ongoing_round.round_id) == {
+        "c": 1,
+        "d": 1,
+    }
+    assert restored_runner.next_switch == next_switch
+    restored_aggregates = restored_runner.game.aggregates
+    assert restored_aggregates.score_by_player_name_by_period["all_time"] == {
+        "Anog1": 1,
+        "Anog2": 1,
+    }
+    assert [summary.round_id for summary in restored_aggregates.recent_rounds] == [
+        completed_round.round_id
+    ]
+
+
+def test_spellings_of_the_ongoing_round_are_restored(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    room_manager = RoomManager(scheduler=Scheduler())
+    game = room_manager.get_or_create("room1").game
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["l'arbres"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["arbre"]))
+    Snapshotter(path, room_manager, room_manager.scheduler).save()
+
+    restored_room_manager = RoomManager(scheduler=Scheduler())
+    Snapshotter(path, restored_room_manager, Scheduler()).restore()
+    restored_game = restored_room_manager.runner_by_room["room1"].game
+    restored_game.complete_current_round()
+    _, result = restored_game.get_game_state()
+    assert result.value_by_word == {"arbre": 1}
+    assert result.display_word("arbre") == "l'arbres"
+
+
+def test_missing_or_invalid_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    assert read_snapshot_file(str(path)) is None
+    path.write_bytes(b"not a snapshot")
+    assert read_snapshot_file(str(path)) is None
+
+
+def test_snapshots_follow_the_clock_of_the_scheduler(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    clock = VirtualClock()
+    scheduler = Scheduler(clock=clock)
+    snapshotter = Snapshotter(path, RoomManager(scheduler=scheduler), scheduler)
+    snapshotter.start()
+
+    deadlines = []
+    while (next_timer := scheduler.pop_next()) is not None:
+        deadlines.append(next_timer[0])
+    assert clock.now() + dt.timedelta(seconds=snapshotter.interval_seconds) in deadlines
@@ -0,0 +1,75 @@
+from src.domain.game import Game
+from src.domain.entities import GuessList
+from src.sqlite_state_store import SqliteStateStore
+
+
+def test_state_is_restored_from_database(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    state = SqliteStateStore(db_path)
+    game = Game(state)
+
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["a", "b"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["a"]))
+    game.complete_current_round()
+    completed_round, result = game.get_game_state()
+
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["c"]))
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["d", "e"]))
+    ongoing_round, _ = game.get_game_state()
+    state.close()
+
+    restored_state = SqliteStateStore(db_path)
+    assert list(restored_state.state.rounds) == [completed_round, ongoing_round]
+    assert restored_state.get_round_result(completed_round.round_id) == result
+    assert restored_state.get_round_result(ongoing_round.round_id) is None
+    assert restored_state.get_player_guesses(ongoing_round.round_id, "Anog1").words == (
+        "d",
+        "e",
+    )
+    assert restored_state.get_word_counts_for_round(ongoing_round.round_id) == {
+        "d": 1,
+        "e": 1,
+    }
+
+
+def test_guesses_are_written_in_batches(tmp_path):
+    state = SqliteStateStore(str(tmp_path / "state.db"))
+    state.flush_batch_size = 3
+    state.flush_interval_seconds = 3600
+    game = Game(state)
+    game.start_new_round()
+
+    def count_stored_guesses():
+        return state.connection.execute("SELECT COUNT(*) FROM guesses").fetchone()[0]
+
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["a"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["a"]))
+    assert count_stored_guesses() == 0
+
+    game.set_guesses(player_name="Anog3", guess_list=GuessList(["a"]))
+    assert count_stored_guesses() == 3
+
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["b"]))
+    game.complete_current_round()
+    assert count_stored_guesses() == 3
+    assert state.connection.execute(
+        "SELECT words FROM guesses WHERE player_name = 'Anog1'"
+    ).fetchone() == ('["b"]',)
+
+
+def test_spellings_of_the_ongoing_round_are_restored(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    state = SqliteStateStore(db_path)
+    game = Game(state)
+    game.start_new_round()
+    game.set_guesses(player_name="Anog1", guess_list=GuessList(["cafés"]))
+    game.set_guesses(player_name="Anog2", guess_list=GuessList(["cafe"]))
+    state.close()
+
+    restored_game = Game(SqliteStateStore(db_path))
+    restored_game.complete_current_round()
+    _, result = restored_game.get_game_state()
+    assert result.value_by_word == {"cafe": 1}
+    assert result.display_word("cafe") == "cafés"
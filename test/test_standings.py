@@ -0,0 +1,24 @@
+from src.domain.entities import RoundResult
+from src.domain.standings import RoundStandings
+
+
+def test_standings_rank_players_with_ties():
+    standings = RoundStandings(
+        RoundResult(
+            score_by_player_name={"a": 1, "b": 5, "c": 3, "d": 3, "e": 0},
+            value_by_word={"x": 0, "y": 2},
+        )
+    )
+
+    assert standings.n_players == 5
+    assert standings.ranked_value_by_word == [("y", 2), ("x", 0)]
+    assert standings.get_page(offset=0, limit=10) == [
+        (1, "b", 5),
+        (2, "c", 3),
+        (2, "d", 3),
+        (4, "a", 1),
+        (5, "e", 0),
+    ]
+    assert standings.get_page(offset=2, limit=2) == [(2, "d", 3), (4, "a", 1)]
+    assert standings.get_player_score_and_rank("d") == (3, 2)
+    assert standings.get_player_score_and_rank("unknown") is None
@@ -0,0 +1,44 @@
+import pytest
+
+from src.domain.game import Game
+from src.domain.entities import GuessList
+from src.round_archive import RoundArchive
+from src.state_store import StateStore
+
+
+def test_oldest_rounds_are_evicted_and_archived(tmp_path):
+    archive = RoundArchive(str(tmp_path / "archive.jsonl"))
+    state = StateStore(max_rounds_stored=2, archive=archive)
+    game = Game(state)
+
+    rounds = []
+    for i in range(4):
+        game.start_new_round()
+        game.set_guesses(player_name="Anog1", guess_list=GuessList([f"word{i}"]))
+        game.complete_current_round()
+        rounds.append(game.get_game_state()[0])
+
+    assert list(state.state.rounds) == rounds[2:]
+    for round_id_by_key in (
+        state.state.result_by_round,
+        state.state.guesses_by_round_and_player_name,
+        state.state.word_counts_by_round,
+        state.state.vocabulary_by_round,
+    ):
+        assert list(round_id_by_key) == [r.round_id for r in rounds[2:]]
+
+    archived_rounds = archive.read()
+    assert [r["round_id"] for r in archived_rounds] == [
+        str(r.round_id) for r in rounds[:2]
+    ]
+    assert archived_rounds[0]["guesses"] == {"Anog1": ["word0"]}
+    assert archived_rounds[0]["result"] == {
+        "score_by_player_name": {"Anog1": 0},
+        "value_by_word": {"word0": 0},
+        "spelling_by_word": {},
+    }
+
+
+def test_at_least_one_round_is_stored():
+    with pytest.raises(ValueError):
+        StateStore(max_rounds_stored=0)